@@ -0,0 +1,42 @@
+"""server-side defaults for updated_at columns
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-10-16 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '008'
+down_revision = '007'
+branch_labels = None
+depends_on = None
+
+
+UPDATED_AT_TABLES = [
+    'bank_settings',
+    'bank_capital',
+    'customer_leads',
+    'product_offers',
+    'product_applications',
+]
+
+
+def upgrade() -> None:
+    # updated_at проставляется базой (server_default + onupdate в моделях)
+    for table in UPDATED_AT_TABLES:
+        op.alter_column(table, 'updated_at',
+                        existing_type=sa.DateTime(),
+                        server_default=sa.text('now()'),
+                        existing_nullable=True)
+
+
+def downgrade() -> None:
+    for table in UPDATED_AT_TABLES:
+        op.alter_column(table, 'updated_at',
+                        existing_type=sa.DateTime(),
+                        server_default=None,
+                        existing_nullable=True)
@@ -0,0 +1,39 @@
+"""server-side defaults for payments timestamps
+
+Revision ID: 009
+Revises: 008
+Create Date: 2026-10-16 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '009'
+down_revision = '008'
+branch_labels = None
+depends_on = None
+
+
+PAYMENT_TIMESTAMP_COLUMNS = [
+    'creation_date_time',
+    'status_update_date_time',
+]
+
+
+def upgrade() -> None:
+    # Даты платежа проставляются базой в том же INSERT (server_default в модели)
+    for column in PAYMENT_TIMESTAMP_COLUMNS:
+        op.alter_column('payments', column,
+                        existing_type=sa.DateTime(),
+                        server_default=sa.text('now()'),
+                        existing_nullable=True)
+
+
+def downgrade() -> None:
+    for column in PAYMENT_TIMESTAMP_COLUMNS:
+        op.alter_column('payments', column,
+                        existing_type=sa.DateTime(),
+                        server_default=None,
+                        existing_nullable=True)
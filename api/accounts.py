@@ -4,7 +4,7 @@ OpenBanking Russia v2.1 compatible
 """
 from fastapi import APIRouter, Depends, HTTPException, Header, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, insert
 from typing import Optional
 from datetime import datetime
 from pydantic import BaseModel
@@ -15,17 +15,19 @@ from database import get_db
 from models import Account, Client, Transaction, BankCapital
 from services.auth_service import get_current_client, get_optional_client
 from services.consent_service import ConsentService
-from services.account_service import get_external_accounts_for_client
+from services.account_service import get_external_accounts_single_flight
 from services.cache_utils import client_key_builder, invalidate_client_cache
 from fastapi import Request
 from log import logger
 from fastapi_cache.decorator import cache
 from config import config
-from redis import asyncio as aioredis
 
 
 router = APIRouter(prefix="/accounts", tags=["2 Счета и балансы"])
 
+VALID_ACCOUNT_TYPES = frozenset({"checking", "savings"})
+VALID_ACCOUNT_STATUSES = frozenset({"active", "closed"})
+
 
 @router.get("", summary="Получить счета")
 async def get_accounts(
@@ -150,12 +152,12 @@ async def get_external_accounts(
     logger.info(f"Fetching external accounts for client_id={client_id}")
     
     # Получить токены из app.state
-    tokens = getattr(request.app.state, "tokens", {})
+    tokens = request.app.state.tokens
     logger.debug(f"Retrieved {len(tokens)} tokens from app.state")
     
     # Получить счета из всех внешних банков
     try:
-        accounts = await get_external_accounts_for_client(
+        accounts = await get_external_accounts_single_flight(
             client_person_id=client_id,
             db=db,
             app_state_tokens=tokens
@@ -165,9 +167,14 @@ async def get_external_accounts(
         logger.error(f"Error fetching external accounts for client_id={client_id}: {e}", exc_info=True)
         raise
     
-    # Подсчитать статистику
-    total_accounts = len([acc for acc in accounts if acc.get("account") is not None])
-    banks_with_accounts = len(set(acc["bank_code"] for acc in accounts if acc.get("account") is not None))
+    # Подсчитать статистику за один проход
+    total_accounts = 0
+    bank_codes_with_accounts = set()
+    for acc in accounts:
+        if acc.get("account") is not None:
+            total_accounts += 1
+            bank_codes_with_accounts.add(acc["bank_code"])
+    banks_with_accounts = len(bank_codes_with_accounts)
     
     logger.info(
         f"External accounts summary for client_id={client_id}: "
@@ -194,6 +201,7 @@ async def get_external_accounts(
 
 @router.post("/external/refresh", summary="Обновить кэш счетов из внешних банков", include_in_schema=False)
 async def refresh_external_accounts(
+    request: Request,
     current_client: dict = Depends(get_current_client),
 ):
     """
@@ -209,17 +217,9 @@ async def refresh_external_accounts(
     client_id = current_client["client_id"]
     logger.info(f"Invalidating cache for external accounts, client_id={client_id}")
     
-    redis_client = None
     try:
-        # Create Redis connection
-        redis_client = await aioredis.from_url(
-            config.REDIS_URL,
-            encoding="utf-8",
-            decode_responses=True
-        )
-        
         # Invalidate cache for this client
-        deleted_keys = await invalidate_client_cache(redis_client, client_id)
+        deleted_keys = await invalidate_client_cache(request.app.state.redis, client_id)
         
         logger.info(f"Cache invalidated for client_id={client_id}, deleted {deleted_keys} keys")
         
@@ -236,13 +236,6 @@ async def refresh_external_accounts(
     except Exception as e:
         logger.error(f"Error invalidating cache for client_id={client_id}: {e}", exc_info=True)
         raise HTTPException(500, f"Error invalidating cache: {str(e)}")
-    finally:
-        # Close Redis connection if it was created
-        if redis_client:
-            try:
-                await redis_client.close()
-            except Exception as close_error:
-                logger.warning(f"Error closing Redis connection: {close_error}")
 
 
 @router.get("/{account_id}", summary="Получить счет")
@@ -421,9 +414,8 @@ async def create_account(
         raise HTTPException(404, "Client not found")
     
     # Валидация типа счета
-    valid_types = ["checking", "savings"]
-    if request.account_type not in valid_types:
-        raise HTTPException(400, f"Invalid account type. Must be one of: {', '.join(valid_types)}")
+    if request.account_type not in VALID_ACCOUNT_TYPES:
+        raise HTTPException(400, f"Invalid account type. Must be one of: {', '.join(sorted(VALID_ACCOUNT_TYPES))}")
     
     # Генерация номера счета
     # 408 - текущий счет, 42301 - сберегательный
@@ -436,26 +428,26 @@ async def create_account(
     
     account_number = f"{account_prefix}{uuid.uuid4().hex[:15]}"
     
-    # Создать счет
-    new_account = Account(
-        client_id=client.id,
-        account_number=account_number,
-        account_type=request.account_type,
-        balance=Decimal(str(request.initial_balance)),
-        currency="RUB",
-        status="active"
+    # Создать счет (INSERT ... RETURNING, без отдельного refresh)
+    new_account_result = await db.execute(
+        insert(Account).values(
+            client_id=client.id,
+            account_number=account_number,
+            account_type=request.account_type,
+            balance=Decimal(str(request.initial_balance)),
+            currency="RUB",
+            status="active"
+        ).returning(Account)
     )
-    
-    db.add(new_account)
+    new_account = new_account_result.scalar_one()
     await db.commit()
-    await db.refresh(new_account)
     
     # Если начальный баланс > 0, создать транзакцию
     if request.initial_balance > 0:
         initial_tx = Transaction(
             account_id=new_account.id,
             transaction_id=f"tx-{uuid.uuid4().hex[:12]}",
-            amount=Decimal(str(request.initial_balance)),
+            amount=new_account.balance,
             direction="credit",
             counterparty="Начальное пополнение",
             description="Начальный баланс при открытии счета"
@@ -510,9 +502,8 @@ async def update_account_status(
         raise HTTPException(403, "Access denied")
     
     # Проверить валидность статуса
-    valid_statuses = ["active", "closed"]
-    if request.status not in valid_statuses:
-        raise HTTPException(400, f"Invalid status. Must be one of: {', '.join(valid_statuses)}")
+    if request.status not in VALID_ACCOUNT_STATUSES:
+        raise HTTPException(400, f"Invalid status. Must be one of: {', '.join(sorted(VALID_ACCOUNT_STATUSES))}")
     
     # Обновить статус
     account.status = request.status
@@ -54,12 +54,20 @@ async def get_transfers(
     
     Для админ панели
     """
+    # Только нужные колонки: строки без гидратации ORM объектов
     result = await db.execute(
-        select(InterbankTransfer)
+        select(
+            InterbankTransfer.transfer_id,
+            InterbankTransfer.from_bank,
+            InterbankTransfer.to_bank,
+            InterbankTransfer.amount,
+            InterbankTransfer.status,
+            InterbankTransfer.created_at
+        )
         .order_by(InterbankTransfer.created_at.desc())
         .limit(limit)
     )
-    transfers = result.scalars().all()
+    transfers = result.all()
     
     return {
         "transfers": [
@@ -123,23 +131,16 @@ async def get_stats(
     capital_result = await db.execute(select(BankCapital).limit(1))
     capital = capital_result.scalar_one_or_none()
     
-    # Подсчет платежей
-    payments_count_result = await db.execute(
-        select(func.count(Payment.id))
-    )
-    payments_count = payments_count_result.scalar()
-    
-    # Подсчет счетов
-    accounts_count_result = await db.execute(
-        select(func.count(Account.id))
-    )
-    accounts_count = accounts_count_result.scalar()
-    
-    # Общая сумма на счетах
-    total_balance_result = await db.execute(
-        select(func.sum(Account.balance))
+    # Количество платежей, количество счетов и общая сумма на счетах - одним запросом
+    totals_result = await db.execute(
+        select(
+            select(func.count(Payment.id)).scalar_subquery(),
+            func.count(Account.id),
+            func.sum(Account.balance)
+        )
     )
-    total_balance = total_balance_result.scalar() or 0
+    payments_count, accounts_count, total_balance = totals_result.one()
+    total_balance = total_balance or 0
     
     return {
         "capital": float(capital.capital) if capital else 0,
@@ -268,7 +269,6 @@ async def update_bank_settings(
     
     if setting:
         setting.value = "true" if update.auto_approve_consents else "false"
-        setting.updated_at = datetime.utcnow()
     else:
         setting = BankSettings(
             key="auto_approve_consents",
@@ -6,6 +6,7 @@ from fastapi import APIRouter, Depends, HTTPException, Form, Query
 from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 
 from config import config
 from database import get_db
@@ -112,6 +113,7 @@ async def login(
     access_token = create_access_token(
         data={
             "sub": client.person_id,
+            "cid": client.id,
             "type": "client",
             "bank": "self"
         }
@@ -342,13 +344,6 @@ async def register_team(
 
     client_id = request.client_id
 
-    # Check if already exists
-    existing = await db.execute(
-        select(Team).where(Team.client_id == client_id)
-    )
-    if existing.scalar_one_or_none():
-        raise HTTPException(400, f"Client ID '{client_id}' уже занят. Попробуйте другой.")
-
     # Generate secure client secret
     client_secret = ''.join(secrets.choice(string.ascii_letters + string.digits) for _ in range(32))
 
@@ -364,36 +359,48 @@ async def register_team(
 
     team_name_with_contacts = " | ".join(team_info_parts)
 
-    new_team = Team(
-        client_id=client_id,
-        client_secret=client_secret,
-        team_name=team_name_with_contacts,  # Включаем всю контактную информацию
-        is_active=True,
-        created_at=datetime.utcnow()
-    )
-    db.add(new_team)
-
-    # Create 10 test clients for this team
     test_clients = []
-    for i in range(1, 11):
-        client = Client(
-            person_id=f"{client_id}-{i}",
-            client_type="INDIVIDUAL",
-            full_name=f"{request.team_name} Test Client {i}",
-            segment="MASS",
-            birth_year=1990,
-            monthly_income=50000,
-            created_at=datetime.utcnow()
+    try:
+        # INSERT ... ON CONFLICT DO NOTHING: проверка занятости client_id и вставка
+        # одним атомарным запросом (без гонки между SELECT и INSERT)
+        new_team_result = await db.execute(
+            pg_insert(Team)
+            .values(
+                client_id=client_id,
+                client_secret=client_secret,
+                team_name=team_name_with_contacts,  # Включаем всю контактную информацию
+                is_active=True,
+                created_at=datetime.utcnow()
+            )
+            .on_conflict_do_nothing(index_elements=["client_id"])
+            .returning(Team.id)
         )
-        db.add(client)
-        test_clients.append(f"{client_id}-{i}")
+        if new_team_result.scalar() is None:
+            raise HTTPException(400, f"Client ID '{client_id}' уже занят. Попробуйте другой.")
+
+        # Create 10 test clients for this team
+        for i in range(1, 11):
+            client = Client(
+                person_id=f"{client_id}-{i}",
+                client_type="INDIVIDUAL",
+                full_name=f"{request.team_name} Test Client {i}",
+                segment="MASS",
+                birth_year=1990,
+                monthly_income=50000,
+                created_at=datetime.utcnow()
+            )
+            db.add(client)
+            test_clients.append(f"{client_id}-{i}")
 
-    try:
         await db.commit()
+    except HTTPException:
+        await db.rollback()
+        raise
     except Exception as e:
         await db.rollback()
         # Check if it's an integrity error (duplicate key)
-        if "duplicate key" in str(e).lower() or "unique constraint" in str(e).lower():
+        error_text = str(e).lower()
+        if "duplicate key" in error_text or "unique constraint" in error_text:
             raise HTTPException(400, f"Тестовые клиенты для '{client_id}' уже существуют. Попробуйте другой Client ID.")
         # Re-raise other exceptions
         raise HTTPException(500, f"Ошибка при создании команды: {str(e)}")
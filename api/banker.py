@@ -115,7 +115,6 @@ async def create_product(
     
     db.add(product)
     await db.commit()
-    await db.refresh(product)
     
     return {"product_id": product.product_id, "status": "created"}
 
@@ -264,27 +263,40 @@ async def get_clients(db: AsyncSession = Depends(get_db)):
     """
     Получить список всех клиентов банка с агрегированными данными
     """
-    result = await db.execute(select(Client))
-    clients = result.scalars().all()
-    
-    clients_data = []
-    for client in clients:
-        # Get client accounts count and total balance
-        accounts_result = await db.execute(
-            select(func.count(Account.id), func.sum(Account.balance))
-            .where(Account.client_id == client.id)
-            .where(Account.status == "active")
+    # Агрегаты по счетам и договорам считаются одним запросом для всех клиентов
+    accounts_stats = (
+        select(
+            Account.client_id,
+            func.count(Account.id).label("accounts_count"),
+            func.sum(Account.balance).label("total_balance")
+        )
+        .where(Account.status == "active")
+        .group_by(Account.client_id)
+        .subquery()
+    )
+    agreements_stats = (
+        select(
+            ProductAgreement.client_id,
+            func.count(ProductAgreement.id).label("agreements_count")
         )
-        accounts_count, total_balance = accounts_result.first()
-        
-        # Get product agreements count
-        agreements_result = await db.execute(
-            select(func.count(ProductAgreement.id))
-            .where(ProductAgreement.client_id == client.id)
-            .where(ProductAgreement.status == "active")
+        .where(ProductAgreement.status == "active")
+        .group_by(ProductAgreement.client_id)
+        .subquery()
+    )
+    
+    result = await db.execute(
+        select(
+            Client,
+            accounts_stats.c.accounts_count,
+            accounts_stats.c.total_balance,
+            agreements_stats.c.agreements_count
         )
-        agreements_count = agreements_result.scalar()
-        
+        .outerjoin(accounts_stats, accounts_stats.c.client_id == Client.id)
+        .outerjoin(agreements_stats, agreements_stats.c.client_id == Client.id)
+    )
+    
+    clients_data = []
+    for client, accounts_count, total_balance, agreements_count in result.all():
         clients_data.append({
             "client_id": client.person_id,
             "full_name": client.full_name,
@@ -2,35 +2,40 @@
 Banks API - Список банков
 """
 from fastapi import APIRouter, Depends
+from fastapi_cache.decorator import cache
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
+from config import config
 from database import get_db
 from models import Bank
+from services.cache_utils import static_key_builder
 
 router = APIRouter(prefix="/banks", tags=["Banks"])
 
 
 @router.get("", summary="Получить список банков")
+@cache(expire=config.CACHE_EXPIRE_SECONDS, key_builder=static_key_builder)
 async def get_banks(
     db: AsyncSession = Depends(get_db)
 ):
     """
     Получить список всех банков
     
-    Возвращает код и название банка
+    Возвращает код и название банка.
+    Список банков меняется редко, ответ кэшируется в Redis.
     """
-    result = await db.execute(select(Bank))
-    banks = result.scalars().all()
+    # Только нужные колонки, без гидратации ORM объектов
+    result = await db.execute(select(Bank.code, Bank.name))
     
     return {
         "data": {
             "bank": [
                 {
-                    "code": bank.code,
-                    "name": bank.name
+                    "code": code,
+                    "name": name
                 }
-                for bank in banks
+                for code, name in result.all()
             ]
         }
     }
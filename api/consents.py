@@ -21,12 +21,13 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, and_, or_
 from typing import Optional, List
 from datetime import datetime, timedelta
+from collections import Counter
 import uuid
 import httpx
 
 from database import get_db
-from models import Consent, ConsentRequest, Notification, Client, Bank
-from services.auth_service import get_current_client, get_current_bank, get_optional_client
+from models import Consent, ConsentRequest, Notification, Bank
+from services.auth_service import get_current_client, get_current_bank, get_optional_client, get_current_client_id
 from services.consent_service import ConsentService
 from config import config
 
@@ -252,32 +253,28 @@ async def authorize_consent(
 
 @router.get("/requests", tags=["Internal: Consents"], include_in_schema=False)
 async def get_consent_requests(
-    current_client: dict = Depends(get_current_client),
+    client_id: int = Depends(get_current_client_id),
     db: AsyncSession = Depends(get_db)
 ):
     """Получить все запросы на согласие для клиента"""
-    if not current_client:
-        raise HTTPException(401, "Unauthorized")
-    
-    # Получить client.id
-    client_result = await db.execute(
-        select(Client).where(Client.person_id == current_client["client_id"])
-    )
-    client = client_result.scalar_one_or_none()
-    
-    if not client:
-        raise HTTPException(404, "Client not found")
-    
-    # Получить pending запросы
+    # Получить pending запросы (только нужные колонки, без ORM-объектов)
     result = await db.execute(
-        select(ConsentRequest).where(
+        select(
+            ConsentRequest.request_id,
+            ConsentRequest.requesting_bank,
+            ConsentRequest.requesting_bank_name,
+            ConsentRequest.permissions,
+            ConsentRequest.reason,
+            ConsentRequest.created_at,
+            ConsentRequest.status
+        ).where(
             and_(
-                ConsentRequest.client_id == client.id,
+                ConsentRequest.client_id == client_id,
                 ConsentRequest.status == "pending"
             )
         ).order_by(ConsentRequest.created_at.desc())
     )
-    requests = result.scalars().all()
+    requests = result.all()
     
     return {
         "requests": [
@@ -347,26 +344,30 @@ async def sign_consent(
 @router.get("/my-consents", tags=["Internal: Consents"], include_in_schema=False)
 async def get_my_consents(
     current_client: dict = Depends(get_current_client),
+    client_id: int = Depends(get_current_client_id),
     db: AsyncSession = Depends(get_db)
 ):
     """Получить все активные согласия клиента"""
-    if not current_client:
-        raise HTTPException(401, "Unauthorized")
-    
-    client_result = await db.execute(
-        select(Client).where(Client.person_id == current_client["client_id"])
-    )
-    client = client_result.scalar_one_or_none()
-    
-    if not client:
-        raise HTTPException(404, "Client not found")
-    
     # Получить все согласия (поддержка как client_id, так и client_id_external)
-    # Join с Bank для получения bank_code и bank_name
+    # Код и имя банка берутся outer join'ом в том же запросе
     result = await db.execute(
-        select(Consent, Bank).outerjoin(Bank, Consent.bank_id == Bank.id).where(
+        select(
+            Consent.consent_id,
+            Consent.client_id,
+            Consent.client_id_external,
+            Bank.code.label("bank_code"),
+            Bank.name.label("bank_name"),
+            Consent.granted_to,
+            Consent.permissions,
+            Consent.status,
+            Consent.signed_at,
+            Consent.expiration_date_time,
+            Consent.last_accessed_at
+        )
+        .outerjoin(Bank, Bank.id == Consent.bank_id)
+        .where(
             or_(
-                Consent.client_id == client.id,
+                Consent.client_id == client_id,
                 Consent.client_id_external == current_client["client_id"]
             )
         )
@@ -380,8 +381,8 @@ async def get_my_consents(
                 "consent_id": c.consent_id,
                 "client_id": c.client_id if c.client_id else None,
                 "client_id_external": c.client_id_external if c.client_id_external else None,
-                "bank_code": bank.code if bank else None,
-                "bank_name": bank.name if bank else None,
+                "bank_code": c.bank_code,
+                "bank_name": c.bank_name,
                 "granted_to": c.granted_to,
                 "permissions": c.permissions,
                 "status": c.status,
@@ -389,7 +390,7 @@ async def get_my_consents(
                 "expires_at": c.expiration_date_time.isoformat() if c.expiration_date_time else None,
                 "last_accessed": c.last_accessed_at.isoformat() if c.last_accessed_at else None
             }
-            for c, bank in consents_data
+            for c in consents_data
         ]
     }
 
@@ -397,17 +398,14 @@ async def get_my_consents(
 @router.delete("/my-consents/{consent_id}", tags=["Internal: Consents"], include_in_schema=False)
 async def revoke_consent(
     consent_id: str,
-    current_client: dict = Depends(get_current_client),
+    client_id: int = Depends(get_current_client_id),
     db: AsyncSession = Depends(get_db)
 ):
     """Отозвать согласие"""
-    if not current_client:
-        raise HTTPException(401, "Unauthorized")
-    
     success = await ConsentService.revoke_consent(
         db=db,
         consent_id=consent_id,
-        client_person_id=current_client["client_id"]
+        client_id=client_id
     )
     
     if not success:
@@ -439,6 +437,7 @@ async def get_account_access_consents_consent_id(
     )
     consent = result.scalar_one_or_none()
     
+    # Ответ собирается из строк БД - валидация pydantic не нужна
     if consent:
         # Маппинг статусов из БД в OpenBanking формат
         status_mapping = {
@@ -448,7 +447,7 @@ async def get_account_access_consents_consent_id(
             "rejected": "Rejected"
         }
         
-        consent_data = ConsentData(
+        consent_data = ConsentData.model_construct(
             consentId=consent.consent_id,
             status=status_mapping.get(consent.status, "Authorized"),  # используем реальный статус из БД
             creationDateTime=consent.creation_date_time.isoformat() + "Z",
@@ -457,7 +456,7 @@ async def get_account_access_consents_consent_id(
             expirationDateTime=consent.expiration_date_time.isoformat() + "Z" if consent.expiration_date_time else None
         )
         
-        return ConsentResponse(
+        return ConsentResponse.model_construct(
             data=consent_data,
             links={
                 "self": f"/account-consents/{consent_id}"
@@ -474,7 +473,7 @@ async def get_account_access_consents_consent_id(
     if not consent_request:
         raise HTTPException(404, "Consent not found")
     
-    consent_data = ConsentData(
+    consent_data = ConsentData.model_construct(
         consentId=consent_id,
         status="AwaitingAuthorization",
         creationDateTime=consent_request.created_at.isoformat() + "Z",
@@ -483,7 +482,7 @@ async def get_account_access_consents_consent_id(
         expirationDateTime=(datetime.utcnow() + timedelta(days=90)).isoformat() + "Z"
     )
     
-    return ConsentResponse(
+    return ConsentResponse.model_construct(
         data=consent_data,
         links={
             "self": f"/account-consents/{consent_id}"
@@ -551,7 +550,7 @@ async def request_consents_from_all_banks(
         }
     
     # Получить токены из app.state
-    tokens = getattr(request.app.state, "tokens", {})
+    tokens = request.app.state.tokens
     
     results = []
     permissions = [
@@ -627,17 +626,16 @@ async def request_consents_from_all_banks(
                 
                 # Проверить, не существует ли уже такое согласие
                 existing_consent = await db.execute(
-                    select(Consent).where(
+                    select(Consent.id).where(
                         and_(
                             Consent.consent_id == consent_id,
                             Consent.client_id_external == current_client["client_id"],
                             Consent.granted_to == bank.api_user
                         )
-                    )
+                    ).limit(1)
                 )
-                existing = existing_consent.scalar_one_or_none()
                 
-                if existing:
+                if existing_consent.scalar() is not None:
                     results.append({
                         "bank_code": bank.code,
                         "bank_name": bank.name or bank.code,
@@ -713,7 +711,6 @@ async def request_consents_from_all_banks(
                 
                 db.add(consent)
                 await db.commit()
-                await db.refresh(consent)
                 
                 results.append({
                     "bank_code": bank.code,
@@ -745,9 +742,11 @@ async def request_consents_from_all_banks(
                 "error": f"Unexpected error: {str(e)}"
             })
     
-    success_count = sum(1 for r in results if r["status"] == "success")
-    error_count = sum(1 for r in results if r["status"] == "error")
-    skipped_count = sum(1 for r in results if r["status"] == "skipped")
+    # Подсчет статусов за один проход по результатам
+    status_counts = Counter(r["status"] for r in results)
+    success_count = status_counts["success"]
+    error_count = status_counts["error"]
+    skipped_count = status_counts["skipped"]
     
     return {
         "message": f"Обработано {len(results)} банков: {success_count} успешно, {error_count} ошибок, {skipped_count} пропущено",
@@ -50,12 +50,12 @@ async def create_customer_lead(
     
     Используется для передачи информации о лидах от СПУ к банку.
     """
-    # Проверить email на дубликаты
+    # Проверить email на дубликаты (проверка существования без загрузки строки)
     if request.email:
         existing = await db.execute(
-            select(CustomerLead).where(CustomerLead.email == request.email)
+            select(CustomerLead.id).where(CustomerLead.email == request.email).limit(1)
         )
-        if existing.scalar_one_or_none():
+        if existing.scalar() is not None:
             raise HTTPException(400, f"Lead with email {request.email} already exists")
     
     # Создать лид
@@ -75,7 +75,6 @@ async def create_customer_lead(
     
     db.add(lead)
     await db.commit()
-    await db.refresh(lead)
     
     return {
         "data": {
@@ -3,6 +3,7 @@ Interbank API - Прием межбанковских переводов
 Используется для коммуникации между банками
 """
 from fastapi import APIRouter, Depends, HTTPException, Header
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel, Field
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
@@ -126,7 +127,6 @@ async def receive_interbank_transfer(
         db.add(interbank_transfer)
         
         await db.commit()
-        await db.refresh(to_account)
         
         return InterbankTransferResponse(
             success=True,
@@ -184,14 +184,24 @@ async def list_interbank_transfers(
     
     Для мониторинга и отладки (админ endpoint)
     """
+    # Только нужные колонки: строки без гидратации ORM объектов
     result = await db.execute(
-        select(InterbankTransfer)
+        select(
+            InterbankTransfer.transfer_id,
+            InterbankTransfer.from_bank,
+            InterbankTransfer.to_bank,
+            InterbankTransfer.amount,
+            InterbankTransfer.status,
+            InterbankTransfer.created_at,
+            InterbankTransfer.completed_at
+        )
         .order_by(InterbankTransfer.created_at.desc())
         .limit(limit)
     )
-    transfers = result.scalars().all()
+    transfers = result.all()
     
-    return [
+    # JSONResponse напрямую: response_model используется только для документации
+    return JSONResponse(content=[
         {
             "transfer_id": t.transfer_id,
             "from_bank": t.from_bank,
@@ -202,5 +212,5 @@ async def list_interbank_transfers(
             "completed_at": t.completed_at.isoformat() if t.completed_at else None
         }
         for t in transfers
-    ]
+    ])
 
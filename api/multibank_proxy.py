@@ -2,13 +2,16 @@
 Multibank Proxy API - Проксирование запросов к другим банкам
 Реализует правильный OpenBanking flow через consent (согласия)
 """
-from fastapi import APIRouter, HTTPException, Header
-from pydantic import BaseModel
-from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Header, Request, Response
+from pydantic import BaseModel, Field
+from typing import List, Optional
+import asyncio
 import httpx
 import os
 import logging
 
+from config import config
+
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/multibank", tags=["Internal: Multibank"], include_in_schema=False)
@@ -18,6 +21,20 @@ TEAM_CLIENT_ID = os.getenv("TEAM_CLIENT_ID", "team200")
 TEAM_CLIENT_SECRET = os.getenv("TEAM_CLIENT_SECRET", "5OAaa4DYzYKfnOU6zbR34ic5qMm7VSMB")
 
 
+def get_http_client(request: Request) -> httpx.AsyncClient:
+    """Общий httpx клиент приложения (создается в lifespan, переиспользует соединения)"""
+    return request.app.state.http_client
+
+
+def _passthrough(response: httpx.Response) -> Response:
+    """Отдать тело ответа банка как есть, без разбора и повторной сериализации JSON"""
+    return Response(
+        content=response.content,
+        status_code=response.status_code,
+        media_type=response.headers.get("content-type", "application/json")
+    )
+
+
 class BankTokenRequest(BaseModel):
     bank_url: str
 
@@ -47,32 +64,45 @@ class ProxyRequest(BaseModel):
     token: str
 
 
+class BalanceTarget(BaseModel):
+    bank_url: str
+    bank_token: str
+    consent_id: str
+    account_id: str
+
+
+class BalancesBatchRequest(BaseModel):
+    targets: List[BalanceTarget] = Field(..., max_length=config.MULTIBANK_BATCH_MAX_TARGETS)
+
+
 @router.post("/bank-token")
-async def get_bank_token(request: BankTokenRequest):
+async def get_bank_token(
+    request: BankTokenRequest,
+    client: httpx.AsyncClient = Depends(get_http_client)
+):
     """
     ШАГ 1: Получить банковский токен для межбанковых операций
     
     Использует креды команды (client_id и client_secret)
     """
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.post(
-                f"{request.bank_url}/auth/bank-token",
-                params={
-                    "client_id": TEAM_CLIENT_ID,
-                    "client_secret": TEAM_CLIENT_SECRET
-                },
-                headers={"accept": "application/json"}
+        response = await client.post(
+            f"{request.bank_url}/auth/bank-token",
+            params={
+                "client_id": TEAM_CLIENT_ID,
+                "client_secret": TEAM_CLIENT_SECRET
+            },
+            headers={"accept": "application/json"}
+        )
+        
+        if response.status_code != 200:
+            raise HTTPException(
+                response.status_code, 
+                f"Failed to get bank token: {response.text}"
             )
-            
-            if response.status_code != 200:
-                raise HTTPException(
-                    response.status_code, 
-                    f"Failed to get bank token: {response.text}"
-                )
-            
-            return response.json()
-            
+        
+        return response.json()
+        
     except httpx.TimeoutException:
         raise HTTPException(504, "Bank server timeout")
     except httpx.RequestError as e:
@@ -80,44 +110,46 @@ async def get_bank_token(request: BankTokenRequest):
 
 
 @router.post("/request-consent")
-async def request_consent(request: ConsentRequest):
+async def request_consent(
+    request: ConsentRequest,
+    client: httpx.AsyncClient = Depends(get_http_client)
+):
     """
     ШАГ 2: Запросить согласие на доступ к счетам клиента
     
     Требуется банковский токен из шага 1
     """
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            # Запрос на создание consent (формат согласно API банков)
-            consent_data = {
-                "client_id": request.client_id,
-                "permissions": [
-                    "ReadAccountsBasic", 
-                    "ReadAccountsDetail", 
-                    "ReadBalances", 
-                    "ReadTransactionsDetail"
-                ],
-                "expiration_date": "2025-12-31T23:59:59.000Z"
+        # Запрос на создание consent (формат согласно API банков)
+        consent_data = {
+            "client_id": request.client_id,
+            "permissions": [
+                "ReadAccountsBasic", 
+                "ReadAccountsDetail", 
+                "ReadBalances", 
+                "ReadTransactionsDetail"
+            ],
+            "expiration_date": "2025-12-31T23:59:59.000Z"
+        }
+        
+        response = await client.post(
+            f"{request.bank_url}/account-consents/request",
+            json=consent_data,
+            headers={
+                "Authorization": f"Bearer {request.bank_token}",
+                "Content-Type": "application/json",
+                "x-requesting-bank": TEAM_CLIENT_ID  # ВАЖНО: указываем requesting_bank!
             }
-            
-            response = await client.post(
-                f"{request.bank_url}/account-consents/request",
-                json=consent_data,
-                headers={
-                    "Authorization": f"Bearer {request.bank_token}",
-                    "Content-Type": "application/json",
-                    "x-requesting-bank": TEAM_CLIENT_ID  # ВАЖНО: указываем requesting_bank!
-                }
+        )
+        
+        if response.status_code not in [200, 201]:
+            raise HTTPException(
+                response.status_code,
+                f"Failed to request consent: {response.text}"
             )
-            
-            if response.status_code not in [200, 201]:
-                raise HTTPException(
-                    response.status_code,
-                    f"Failed to request consent: {response.text}"
-                )
-            
-            return response.json()
-            
+        
+        return response.json()
+        
     except httpx.TimeoutException:
         raise HTTPException(504, "Bank server timeout")
     except httpx.RequestError as e:
@@ -125,33 +157,35 @@ async def request_consent(request: ConsentRequest):
 
 
 @router.post("/accounts-with-consent")
-async def get_accounts_with_consent(request: AccountsWithConsentRequest):
+async def get_accounts_with_consent(
+    request: AccountsWithConsentRequest,
+    client: httpx.AsyncClient = Depends(get_http_client)
+):
     """
     ШАГ 3: Получить счета клиента используя consent
     
     Требуется банковский токен и consent_id из предыдущих шагов
     """
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            url = f"{request.bank_url}/accounts"
-            headers = {
-                "accept": "application/json",
-                "Authorization": f"Bearer {request.bank_token}",
-                "x-consent-id": request.consent_id,
-                "x-requesting-bank": TEAM_CLIENT_ID
-            }
-            params = {"client_id": request.client_id}
-            
-            response = await client.get(url, headers=headers, params=params)
-            
-            if response.status_code != 200:
-                raise HTTPException(
-                    response.status_code,
-                    f"Failed to get accounts: {response.text}"
-                )
-            
-            return response.json()
-            
+        url = f"{request.bank_url}/accounts"
+        headers = {
+            "accept": "application/json",
+            "Authorization": f"Bearer {request.bank_token}",
+            "x-consent-id": request.consent_id,
+            "x-requesting-bank": TEAM_CLIENT_ID
+        }
+        params = {"client_id": request.client_id}
+        
+        response = await client.get(url, headers=headers, params=params)
+        
+        if response.status_code != 200:
+            raise HTTPException(
+                response.status_code,
+                f"Failed to get accounts: {response.text}"
+            )
+        
+        return _passthrough(response)
+        
     except httpx.TimeoutException:
         raise HTTPException(504, "Bank server timeout")
     except httpx.RequestError as e:
@@ -159,27 +193,29 @@ async def get_accounts_with_consent(request: AccountsWithConsentRequest):
 
 
 @router.post("/login")
-async def proxy_login(request: LoginRequest):
+async def proxy_login(
+    request: LoginRequest,
+    client: httpx.AsyncClient = Depends(get_http_client)
+):
     """
     УСТАРЕВШИЙ: Прямой логин (оставлен для обратной совместимости)
     
     Используйте новый flow: bank-token -> request-consent -> accounts-with-consent
     """
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.post(
-                f"{request.bank_url}/auth/login",
-                json={
-                    "username": request.username,
-                    "password": request.password
-                }
-            )
-            
-            if response.status_code != 200:
-                raise HTTPException(response.status_code, "Authentication failed")
-            
-            return response.json()
-            
+        response = await client.post(
+            f"{request.bank_url}/auth/login",
+            json={
+                "username": request.username,
+                "password": request.password
+            }
+        )
+        
+        if response.status_code != 200:
+            raise HTTPException(response.status_code, "Authentication failed")
+        
+        return response.json()
+        
     except httpx.TimeoutException:
         raise HTTPException(504, "Bank server timeout")
     except httpx.RequestError as e:
@@ -187,24 +223,26 @@ async def proxy_login(request: LoginRequest):
 
 
 @router.post("/accounts")
-async def proxy_accounts(request: ProxyRequest):
+async def proxy_accounts(
+    request: ProxyRequest,
+    client: httpx.AsyncClient = Depends(get_http_client)
+):
     """
     Проксирует запрос получения счетов к другому банку
     """
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.get(
-                f"{request.bank_url}{request.endpoint}",
-                headers={
-                    "Authorization": f"Bearer {request.token}"
-                }
-            )
-            
-            if response.status_code != 200:
-                raise HTTPException(response.status_code, "Failed to fetch accounts")
-            
-            return response.json()
-            
+        response = await client.get(
+            f"{request.bank_url}{request.endpoint}",
+            headers={
+                "Authorization": f"Bearer {request.token}"
+            }
+        )
+        
+        if response.status_code != 200:
+            raise HTTPException(response.status_code, "Failed to fetch accounts")
+        
+        return _passthrough(response)
+        
     except httpx.TimeoutException:
         raise HTTPException(504, "Bank server timeout")
     except httpx.RequestError as e:
@@ -216,39 +254,101 @@ async def get_balance_with_consent(
     account_id: str,
     bank_url: str,
     bank_token: str,
-    consent_id: str
+    consent_id: str,
+    client: httpx.AsyncClient = Depends(get_http_client)
 ):
     """
     Получить баланс счета используя consent (правильный OpenBanking flow)
     """
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.get(
-                f"{bank_url}/accounts/{account_id}/balances",
-                headers={
-                    "accept": "application/json",
-                    "Authorization": f"Bearer {bank_token}",
-                    "x-consent-id": consent_id,
-                    "x-requesting-bank": TEAM_CLIENT_ID
-                }
-            )
-            
-            if response.status_code != 200:
-                raise HTTPException(response.status_code, f"Failed to fetch balance: {response.text}")
-            
-            return response.json()
-            
+        response = await client.get(
+            f"{bank_url}/accounts/{account_id}/balances",
+            headers={
+                "accept": "application/json",
+                "Authorization": f"Bearer {bank_token}",
+                "x-consent-id": consent_id,
+                "x-requesting-bank": TEAM_CLIENT_ID
+            }
+        )
+        
+        if response.status_code != 200:
+            raise HTTPException(response.status_code, f"Failed to fetch balance: {response.text}")
+        
+        return _passthrough(response)
+        
     except httpx.TimeoutException:
         raise HTTPException(504, "Bank server timeout")
     except httpx.RequestError as e:
         raise HTTPException(502, f"Connection error: {str(e)}")
 
 
+async def _fetch_balance_with_consent(target: BalanceTarget, client: httpx.AsyncClient) -> dict:
+    """Получить баланс одного счета; ошибка возвращается в результате, а не выбрасывается"""
+    result = {"bank_url": target.bank_url, "account_id": target.account_id}
+    try:
+        response = await client.get(
+            f"{target.bank_url}/accounts/{target.account_id}/balances",
+            headers={
+                "accept": "application/json",
+                "Authorization": f"Bearer {target.bank_token}",
+                "x-consent-id": target.consent_id,
+                "x-requesting-bank": TEAM_CLIENT_ID
+            }
+        )
+        
+        if response.status_code != 200:
+            result["error"] = f"HTTP {response.status_code}: {response.text[:200]}"
+        else:
+            result["data"] = response.json()
+            
+    except httpx.TimeoutException:
+        result["error"] = "Bank server timeout"
+    except httpx.RequestError as e:
+        result["error"] = f"Connection error: {str(e)}"
+    
+    return result
+
+
+@router.post("/balances-with-consent/batch")
+async def get_balances_with_consent_batch(
+    request: BalancesBatchRequest,
+    client: httpx.AsyncClient = Depends(get_http_client)
+):
+    """
+    Получить балансы нескольких счетов (в т.ч. в разных банках) одним запросом
+    
+    Запросы к банкам выполняются параллельно (не более
+    MULTIBANK_BATCH_CONCURRENCY одновременно, до MULTIBANK_BATCH_MAX_TARGETS счетов);
+    ошибка по одному счету не прерывает остальные и возвращается в поле error.
+    """
+    # Ограничить число одновременных запросов, чтобы batch не занял весь пул общего клиента
+    semaphore = asyncio.Semaphore(config.MULTIBANK_BATCH_CONCURRENCY)
+
+    async def fetch_limited(target: BalanceTarget) -> dict:
+        async with semaphore:
+            return await _fetch_balance_with_consent(target, client)
+
+    results = await asyncio.gather(
+        *(fetch_limited(target) for target in request.targets),
+        return_exceptions=True
+    )
+    
+    data = []
+    for target, result in zip(request.targets, results):
+        if isinstance(result, Exception):
+            logger.error("Unexpected error fetching balance for %s from %s: %s", target.account_id, target.bank_url, result)
+            result = {"bank_url": target.bank_url, "account_id": target.account_id, "error": str(result)}
+        data.append(result)
+    
+    return {"data": data}
+
+
 @router.get("/accounts/{account_id}/balances")
 async def proxy_balance(
     account_id: str,
     bank_url: str,
-    token: str
+    token: str,
+    client: httpx.AsyncClient = Depends(get_http_client)
 ):
     """
     УСТАРЕВШИЙ: Получить баланс (старый метод, оставлен для совместимости)
@@ -256,19 +356,18 @@ async def proxy_balance(
     Используйте balances-with-consent для правильного OpenBanking flow
     """
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.get(
-                f"{bank_url}/accounts/{account_id}/balances",
-                headers={
-                    "Authorization": f"Bearer {token}"
-                }
-            )
-            
-            if response.status_code != 200:
-                raise HTTPException(response.status_code, "Failed to fetch balance")
-            
-            return response.json()
-            
+        response = await client.get(
+            f"{bank_url}/accounts/{account_id}/balances",
+            headers={
+                "Authorization": f"Bearer {token}"
+            }
+        )
+        
+        if response.status_code != 200:
+            raise HTTPException(response.status_code, "Failed to fetch balance")
+        
+        return _passthrough(response)
+        
     except httpx.TimeoutException:
         raise HTTPException(504, "Bank server timeout")
     except httpx.RequestError as e:
@@ -239,8 +239,9 @@ async def get_payment_consent(
     if not consent:
         raise HTTPException(404, "Payment consent not found")
     
-    return PaymentConsentResponse(
-        data=PaymentConsentResponseData(
+    # Ответ собирается из строки БД - валидация pydantic не нужна
+    return PaymentConsentResponse.model_construct(
+        data=PaymentConsentResponseData.model_construct(
             consentId=consent.consent_id,
             status=consent.status,
             creationDateTime=consent.creation_date_time.isoformat() + "Z",
@@ -304,25 +305,20 @@ async def list_pending_payment_consents(
     if not current_banker:
         raise HTTPException(401, "Banker access required")
     
+    # Запросы вместе с клиентами одним LEFT OUTER JOIN
     result = await db.execute(
-        select(PaymentConsentRequest)
+        select(PaymentConsentRequest, Client.person_id, Client.full_name)
+        .outerjoin(Client, Client.id == PaymentConsentRequest.client_id)
         .where(PaymentConsentRequest.status == "pending")
         .order_by(PaymentConsentRequest.created_at.desc())
     )
-    requests = result.scalars().all()
     
     response = []
-    for req in requests:
-        # Получить клиента
-        client_result = await db.execute(
-            select(Client).where(Client.id == req.client_id)
-        )
-        client = client_result.scalar_one_or_none()
-        
+    for req, client_person_id, client_full_name in result.all():
         response.append({
             "request_id": req.request_id,
-            "client_id": client.person_id if client else "unknown",
-            "client_name": client.full_name if client else "Unknown",
+            "client_id": client_person_id or "unknown",
+            "client_name": client_full_name or "Unknown",
             "requesting_bank": req.requesting_bank,
             "amount": float(req.amount),
             "currency": req.currency,
@@ -3,31 +3,51 @@ Payments API - Инициирование переводов
 OpenBanking Russia Payments API compatible
 Спецификация: https://wiki.opendatarussia.ru/specifications (Payments API)
 """
-from fastapi import APIRouter, Depends, HTTPException, Header, Request
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Header, Request
 from pydantic import BaseModel, Field
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_
+from sqlalchemy import select, update, and_
+from sqlalchemy.exc import SQLAlchemyError
 from typing import Optional
-from datetime import datetime
+from datetime import datetime, timezone
 from decimal import Decimal
-import uuid
+from secrets import token_hex
 
 from database import get_db
-from models import Payment, Account, PaymentConsent, Bank
-from services.auth_service import get_current_client
+from models import Payment, Account, PaymentConsent
+from services.auth_service import get_current_client, resolve_current_client_id
 from services.payment_service import PaymentService
 from services.external_payment_service import execute_external_payment
+from services.cache_utils import client_path_key_builder, invalidate_client_cache_in_background
+from services.bank_service import get_banks_by_codes
 from log import logger
+from fastapi_cache.decorator import cache
+from config import config
 
 
 router = APIRouter(prefix="/payments", tags=["4 Переводы"])
 
+# Ответы об ошибках согласия (константы, не собираются на каждый запрос)
+PAYMENT_CONSENT_REQUIRED_DETAIL = {
+    "error": "PAYMENT_CONSENT_REQUIRED",
+    "message": "Требуется согласие клиента на платеж",
+    "consent_request_url": "/payment-consents/request"
+}
+INVALID_CONSENT_DETAIL = {
+    "error": "INVALID_CONSENT",
+    "message": "Согласие недействительно, истекло или уже использовано"
+}
+CONSENT_MISMATCH_DETAIL = {
+    "error": "CONSENT_MISMATCH",
+    "message": "Согласие выдано другому банку"
+}
+
 
 # === Pydantic Models (OpenBanking Russia format) ===
 
 class AmountModel(BaseModel):
     """Сумма платежа"""
-    amount: str = Field(..., description="Сумма в формате строки")
+    amount: Decimal = Field(..., description="Сумма (строка или число)", gt=0, max_digits=15, decimal_places=2)
     currency: str = "RUB"
 
 
@@ -38,20 +58,30 @@ class AccountIdentification(BaseModel):
     name: Optional[str] = None
 
 
+class RemittanceInformation(BaseModel):
+    """Назначение платежа"""
+    unstructured: str = ""
+
+
 class PaymentInitiation(BaseModel):
     """Данные для инициации платежа"""
-    instructionIdentification: str = Field(default_factory=lambda: f"instr-{uuid.uuid4().hex[:8]}")
-    endToEndIdentification: str = Field(default_factory=lambda: f"e2e-{uuid.uuid4().hex[:8]}")
+    instructionIdentification: str = Field(default_factory=lambda: f"instr-{token_hex(4)}")
+    endToEndIdentification: str = Field(default_factory=lambda: f"e2e-{token_hex(4)}")
     instructedAmount: AmountModel
     debtorAccount: AccountIdentification
     creditorAccount: AccountIdentification
-    remittanceInformation: Optional[dict] = None
+    remittanceInformation: Optional[RemittanceInformation] = None
+
+
+class PaymentInitiationEnvelope(BaseModel):
+    """Блок data запроса платежа"""
+    initiation: PaymentInitiation
 
 
 class PaymentRequest(BaseModel):
     """Запрос создания платежа (OpenBanking Russia format)"""
-    data: dict = Field(..., description="Содержит initiation")
-    risk: Optional[dict] = {}
+    data: PaymentInitiationEnvelope = Field(..., description="Содержит initiation")
+    risk: Optional[dict] = Field(default_factory=dict)
 
 
 class PaymentData(BaseModel):
@@ -66,12 +96,14 @@ class PaymentResponse(BaseModel):
     """Ответ с платежом"""
     data: PaymentData
     links: dict
-    meta: Optional[dict] = {}
+    meta: Optional[dict] = Field(default_factory=dict)
 
 
 # === Endpoints ===
 
-@router.post("", response_model=PaymentResponse, status_code=201, summary="Создать платеж")
+# response_model=None: ответ уже собран как PaymentResponse, FastAPI не валидирует его повторно
+# (схема для OpenAPI задается через responses)
+@router.post("", response_model=None, responses={201: {"model": PaymentResponse}}, status_code=201, summary="Создать платеж")
 async def create_payment(
     request: PaymentRequest,
     x_fapi_interaction_id: Optional[str] = Header(None, alias="x-fapi-interaction-id"),
@@ -145,6 +177,9 @@ async def create_payment(
     if not current_client:
         raise HTTPException(401, "Unauthorized")
     
+    # Одно время на весь запрос (naive UTC, как в колонках БД)
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    
     # Проверка согласия для межбанковых запросов
     payment_consent_id_to_store = None
     if x_requesting_bank:
@@ -152,85 +187,72 @@ async def create_payment(
         if not x_payment_consent_id:
             raise HTTPException(
                 403,
-                detail={
-                    "error": "PAYMENT_CONSENT_REQUIRED",
-                    "message": "Требуется согласие клиента на платеж",
-                    "consent_request_url": "/payment-consents/request"
-                }
+                detail=PAYMENT_CONSENT_REQUIRED_DETAIL
             )
 
-        # Проверить согласие
+        # Проверить согласие и сразу пометить его использованным - одним
+        # условным UPDATE (атомарно: два параллельных платежа не используют одно согласие).
+        # Изменение коммитится вместе с платежом внутри initiate_payment,
+        # при ошибке платежа get_db откатит его
         consent_result = await db.execute(
-            select(PaymentConsent).where(
+            update(PaymentConsent)
+            .where(
                 and_(
                     PaymentConsent.consent_id == x_payment_consent_id,
                     PaymentConsent.status == "active",
-                    PaymentConsent.expiration_date_time > datetime.utcnow()
+                    PaymentConsent.expiration_date_time > now,
+                    PaymentConsent.granted_to == x_requesting_bank
                 )
             )
+            .values(status="used", used_at=now, status_update_date_time=now)
+            .returning(PaymentConsent.id)
         )
-        payment_consent = consent_result.scalar_one_or_none()
 
-        if not payment_consent:
-            raise HTTPException(
-                403,
-                detail={
-                    "error": "INVALID_CONSENT",
-                    "message": "Согласие недействительно, истекло или уже использовано"
-                }
+        if consent_result.scalar_one_or_none() is None:
+            # Только на пути ошибки: различить чужое согласие и недействительное
+            mismatch_result = await db.execute(
+                select(PaymentConsent.id).where(
+                    and_(
+                        PaymentConsent.consent_id == x_payment_consent_id,
+                        PaymentConsent.status == "active",
+                        PaymentConsent.expiration_date_time > now,
+                        PaymentConsent.granted_to != x_requesting_bank
+                    )
+                ).limit(1)
             )
+            if mismatch_result.scalar() is not None:
+                raise HTTPException(
+                    403,
+                    detail=CONSENT_MISMATCH_DETAIL
+                )
 
-        # Проверить что согласие выдано запрашивающему банку
-        if payment_consent.granted_to != x_requesting_bank:
             raise HTTPException(
                 403,
-                detail={
-                    "error": "CONSENT_MISMATCH",
-                    "message": "Согласие выдано другому банку"
-                }
+                detail=INVALID_CONSENT_DETAIL
             )
 
         payment_consent_id_to_store = x_payment_consent_id
 
-    # Извлечь данные из request
-    initiation = request.data.get("initiation")
-    if not initiation:
-        raise HTTPException(400, "Missing initiation data")
-    
-    amount_data = initiation.get("instructedAmount", {})
-    debtor_account = initiation.get("debtorAccount", {})
-    creditor_account = initiation.get("creditorAccount", {})
+    # Извлечь данные из request (сумма уже разобрана в Decimal при валидации)
+    initiation = request.data.initiation
     
     # Описание платежа
-    remittance = initiation.get("remittanceInformation", {})
-    description = remittance.get("unstructured", "") if remittance else ""
+    remittance = initiation.remittanceInformation
+    description = remittance.unstructured if remittance else ""
     
     try:
         # Инициировать платеж
         payment, interbank = await PaymentService.initiate_payment(
             db=db,
-            from_account_number=debtor_account.get("identification"),
-            to_account_number=creditor_account.get("identification"),
-            amount=Decimal(amount_data.get("amount", "0")),
+            from_account_number=initiation.debtorAccount.identification,
+            to_account_number=initiation.creditorAccount.identification,
+            amount=initiation.instructedAmount.amount,
             description=description,
-            payment_consent_id=payment_consent_id_to_store
+            payment_consent_id=payment_consent_id_to_store,
+            now=now
         )
 
-        # Если использовалось согласие - пометить его как использованное
-        if payment_consent_id_to_store:
-            consent_result = await db.execute(
-                select(PaymentConsent).where(PaymentConsent.consent_id == payment_consent_id_to_store)
-            )
-            consent = consent_result.scalar_one_or_none()
-            if consent:
-                consent.status = "used"
-                consent.used_at = datetime.utcnow()
-                consent.status_update_date_time = datetime.utcnow()
-                await db.commit()
-
         # Формируем ответ OpenBanking Russia
-        now = datetime.utcnow()
-        
         payment_data = PaymentData(
             paymentId=payment.payment_id,
             status=payment.status,
@@ -250,7 +272,8 @@ async def create_payment(
         raise HTTPException(400, str(e))
 
 
-@router.get("/{payment_id}", response_model=PaymentResponse, summary="Получить платеж")
+@router.get("/{payment_id}", response_model=None, responses={200: {"model": PaymentResponse}}, summary="Получить платеж")
+@cache(expire=config.PAYMENT_CACHE_EXPIRE_SECONDS, key_builder=client_path_key_builder)
 async def get_payment(
     payment_id: str,
     x_fapi_interaction_id: Optional[str] = Header(None, alias="x-fapi-interaction-id"),
@@ -266,13 +289,13 @@ async def get_payment(
     if not current_client:
         raise HTTPException(401, "Unauthorized")
     
-    payment = await PaymentService.get_payment(db, payment_id)
+    # Клиент видит только платежи со своих счетов; чужой платеж - 404
+    client_id = await resolve_current_client_id(current_client, db)
+    payment = await PaymentService.get_payment(db, payment_id, client_id=client_id)
     
     if not payment:
         raise HTTPException(404, "Payment not found")
     
-    # TODO: Проверить что клиент имеет право просматривать этот платеж
-    
     payment_data = PaymentData(
         paymentId=payment.payment_id,
         status=payment.status,
@@ -309,10 +332,11 @@ class ExternalPaymentResponse(BaseModel):
 
 # === External Payment Endpoints ===
 
-@router.post("/external", response_model=ExternalPaymentResponse, summary="Создать платеж во внешний банк")
+@router.post("/external", response_model=None, responses={200: {"model": ExternalPaymentResponse}}, summary="Создать платеж во внешний банк")
 async def create_external_payment(
     request_data: ExternalPaymentRequest,
     request: Request,
+    background_tasks: BackgroundTasks,
     current_client: dict = Depends(get_current_client),
     db: AsyncSession = Depends(get_db)
 ):
@@ -361,24 +385,18 @@ async def create_external_payment(
     )
 
     # Парсинг счетов (формат: bank_code:account_id)
-    try:
-        from_parts = request_data.from_account.split(":", 1)
-        to_parts = request_data.to_account.split(":", 1)
+    from_bank_code, from_sep, from_account_id = request_data.from_account.partition(":")
+    to_bank_code, to_sep, to_account_id = request_data.to_account.partition(":")
 
-        if len(from_parts) != 2 or len(to_parts) != 2:
-            raise ValueError("Invalid account format. Expected 'bank_code:account_id'")
+    if not from_sep or not to_sep:
+        logger.warning("Invalid account format in external payment request")
+        raise HTTPException(400, "Invalid account format. Expected 'bank_code:account_id'")
 
-        from_bank_code, from_account_id = from_parts
-        to_bank_code, to_account_id = to_parts
-    except Exception as e:
-        logger.warning(f"Invalid account format in external payment request: {e}")
-        raise HTTPException(400, f"Invalid account format: {str(e)}")
+    # Исходный (source) и целевой (destination) банки - из кэша Redis, при промахе из БД
+    banks = await get_banks_by_codes(db, request.app.state.redis, [from_bank_code, to_bank_code])
 
-    # Получить исходный банк (source bank) - тот, с которого переводим
-    source_bank_result = await db.execute(
-        select(Bank).where(Bank.code == from_bank_code)
-    )
-    source_bank = source_bank_result.scalar_one_or_none()
+    # Исходный банк (source bank) - тот, с которого переводим
+    source_bank = banks.get(from_bank_code)
 
     if not source_bank:
         logger.warning(f"Source bank not found: {from_bank_code}")
@@ -388,18 +406,15 @@ async def create_external_payment(
         logger.warning(f"Source bank {from_bank_code} is not an external bank")
         raise HTTPException(400, f"Source bank {from_bank_code} is not an external bank")
 
-    # Получить целевой банк (destination bank) для сохранения в базе
-    dest_bank_result = await db.execute(
-        select(Bank).where(Bank.code == to_bank_code)
-    )
-    dest_bank = dest_bank_result.scalar_one_or_none()
+    # Целевой банк (destination bank) для сохранения в базе
+    dest_bank = banks.get(to_bank_code)
 
     if not dest_bank:
         logger.warning(f"Destination bank not found: {to_bank_code}")
         raise HTTPException(404, f"Destination bank not found: {to_bank_code}")
 
     # Получить токен для исходного банка (source bank)
-    tokens = getattr(request.app.state, "tokens", {})
+    tokens = request.app.state.tokens
     bank_token_info = tokens.get(from_bank_code, {})
     token = bank_token_info.get("token")
 
@@ -407,6 +422,11 @@ async def create_external_payment(
         logger.error(f"No token available for source bank {from_bank_code}")
         raise HTTPException(503, f"Service unavailable: No token for source bank {from_bank_code}")
 
+    # Завершить читающую транзакцию до запроса во внешний банк: соединение
+    # возвращается в пул и не простаивает "idle in transaction" секундами
+    # (если банки пришли из кэша, транзакции нет и это no-op)
+    await db.commit()
+
     # Выполнить платеж через исходный банк (source bank)
     try:
         result = await execute_external_payment(
@@ -428,7 +448,7 @@ async def create_external_payment(
             )
 
         # Создать локальную запись о платеже
-        payment_id = f"pay-ext-{uuid.uuid4().hex[:16]}"
+        payment_id = f"pay-ext-{token_hex(8)}"
 
         new_payment = Payment(
             payment_id=payment_id,
@@ -444,9 +464,7 @@ async def create_external_payment(
             source_bank=from_bank_code,
             source_bank_id=source_bank.id,
             destination_bank_id=dest_bank.id,
-            external_payment_id=result["external_payment_id"],
-            creation_date_time=datetime.utcnow(),
-            status_update_date_time=datetime.utcnow()
+            external_payment_id=result["external_payment_id"]
         )
 
         db.add(new_payment)
@@ -457,6 +475,10 @@ async def create_external_payment(
             f"external_id={result['external_payment_id']}, status={result['status']}"
         )
 
+        # Балансы во внешних банках изменились - сбросить кэш /accounts/external
+        # (после отправки ответа, не задерживая клиента)
+        background_tasks.add_task(invalidate_client_cache_in_background, request.app.state.redis, client_id)
+
         return ExternalPaymentResponse(
             success=True,
             payment_id=payment_id,
@@ -464,6 +486,10 @@ async def create_external_payment(
             status=result["status"]
         )
 
+    except SQLAlchemyError as e:
+        # Ожидаемый сбой (БД недоступна) - без трейсбека, чтобы не нагружать лог при аварии
+        logger.error(f"Database error creating external payment: {e!r}")
+        raise HTTPException(500, f"Internal server error: {str(e)[:100]}")
     except Exception as e:
         logger.error(f"Error creating external payment: {e}", exc_info=True)
         raise HTTPException(500, f"Internal server error: {str(e)[:100]}")
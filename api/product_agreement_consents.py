@@ -328,25 +328,20 @@ async def list_pending_product_agreement_consents(
     if not current_banker:
         raise HTTPException(401, "Banker access required")
     
+    # Запросы вместе с клиентами одним LEFT OUTER JOIN
     result = await db.execute(
-        select(ProductAgreementConsentRequest)
+        select(ProductAgreementConsentRequest, Client.person_id, Client.full_name)
+        .outerjoin(Client, Client.id == ProductAgreementConsentRequest.client_id)
         .where(ProductAgreementConsentRequest.status == "pending")
         .order_by(ProductAgreementConsentRequest.created_at.desc())
     )
-    requests = result.scalars().all()
     
     response = []
-    for req in requests:
-        # Получить клиента
-        client_result = await db.execute(
-            select(Client).where(Client.id == req.client_id)
-        )
-        client = client_result.scalar_one_or_none()
-        
+    for req, client_person_id, client_full_name in result.all():
         response.append({
             "request_id": req.request_id,
-            "client_id": client.person_id if client else "unknown",
-            "client_name": client.full_name if client else "Unknown",
+            "client_id": client_person_id or "unknown",
+            "client_name": client_full_name or "Unknown",
             "requesting_bank": req.requesting_bank,
             "read_product_agreements": req.read_product_agreements,
             "open_product_agreements": req.open_product_agreements,
@@ -12,10 +12,12 @@ import uuid
 
 from database import get_db
 from models import ProductAgreement, Product, Client, Account, BankCapital, Transaction
-from services.auth_service import get_current_client
+from services.auth_service import get_current_client_id, get_current_client_model
 
 router = APIRouter(prefix="/product-agreements", tags=["7 Договоры с продуктами"])
 
+ZERO_AMOUNT = Decimal("0")
+
 
 class ProductAgreementRequest(BaseModel):
     """Запрос на открытие продукта"""
@@ -40,7 +42,7 @@ class ProductAgreementResponse(BaseModel):
 
 @router.get("", summary="Получить договоры")
 async def get_agreements(
-    current_client: dict = Depends(get_current_client),
+    client_id: int = Depends(get_current_client_id),
     db: AsyncSession = Depends(get_db)
 ):
     """
@@ -48,37 +50,19 @@ async def get_agreements(
     
     Возвращает все активные договоры с продуктами (депозиты, кредиты, карты)
     """
-    # Найти клиента
-    result = await db.execute(
-        select(Client).where(Client.person_id == current_client["client_id"])
-    )
-    client = result.scalar_one_or_none()
-    
-    if not client:
-        raise HTTPException(404, "Client not found")
-    
-    # Получить договоры
+    # Получить договоры клиента вместе с номерами связанных счетов
     agreements_result = await db.execute(
-        select(ProductAgreement, Product)
+        select(ProductAgreement, Product, Account.account_number)
         .join(Product, ProductAgreement.product_id == Product.id)
-        .where(ProductAgreement.client_id == client.id)
+        .outerjoin(Account, ProductAgreement.account_id == Account.id)
+        .where(ProductAgreement.client_id == client_id)
         .order_by(ProductAgreement.created_at.desc())
     )
     
     agreements_data = agreements_result.all()
     
-    # Получить связанные счета
     agreements_list = []
-    for agreement, product in agreements_data:
-        account_number = None
-        if agreement.account_id:
-            account_result = await db.execute(
-                select(Account).where(Account.id == agreement.account_id)
-            )
-            account = account_result.scalar_one_or_none()
-            if account:
-                account_number = account.account_number
-        
+    for agreement, product, account_number in agreements_data:
         agreements_list.append({
             "agreement_id": agreement.agreement_id,
             "product_id": product.product_id,
@@ -102,7 +86,7 @@ async def get_agreements(
 @router.post("", summary="Создать договор")
 async def create_agreement(
     request: ProductAgreementRequest,
-    current_client: dict = Depends(get_current_client),
+    client: Client = Depends(get_current_client_model),
     db: AsyncSession = Depends(get_db)
 ):
     """
@@ -112,20 +96,11 @@ async def create_agreement(
     - Кредит: проверяется капитал банка, создается счет с кредитными средствами
     - Карта: создается счет с лимитом
     """
-    # Найти клиента
-    result = await db.execute(
-        select(Client).where(Client.person_id == current_client["client_id"])
-    )
-    client = result.scalar_one_or_none()
-    
-    if not client:
-        raise HTTPException(404, "Client not found")
-    
     # Найти продукт
-    product_result = await db.execute(
+    result = await db.execute(
         select(Product).where(Product.product_id == request.product_id)
     )
-    product = product_result.scalar_one_or_none()
+    product = result.scalar_one_or_none()
     
     if not product:
         raise HTTPException(404, "Product not found")
@@ -133,12 +108,15 @@ async def create_agreement(
     if not product.is_active:
         raise HTTPException(400, "Product is not active")
     
+    # Сумма договора как Decimal, вычисляется один раз
+    amount = Decimal(str(request.amount))
+    
     # Проверить минимальную сумму
-    if product.min_amount and Decimal(str(request.amount)) < product.min_amount:
+    if product.min_amount and amount < product.min_amount:
         raise HTTPException(400, f"Amount must be at least {product.min_amount}")
     
     # Проверить максимальную сумму
-    if product.max_amount and Decimal(str(request.amount)) > product.max_amount:
+    if product.max_amount and amount > product.max_amount:
         raise HTTPException(400, f"Amount must not exceed {product.max_amount}")
     
     # Создать договор
@@ -153,6 +131,7 @@ async def create_agreement(
     
     # Обработка в зависимости от типа продукта
     account_id = None
+    account_number = None
     
     if product.product_type == "deposit":
         # Депозит: ТРЕБУЕТСЯ пополнение из существующего счета
@@ -173,17 +152,17 @@ async def create_agreement(
             if not source_account:
                 raise HTTPException(404, "Source account not found")
             
-            if source_account.balance < Decimal(str(request.amount)):
+            if source_account.balance < amount:
                 raise HTTPException(400, f"Insufficient funds. Available: {source_account.balance}, Required: {request.amount}")
             
             # Списать со source account
-            source_account.balance -= Decimal(str(request.amount))
+            source_account.balance -= amount
             
             # Создать транзакцию списания
             debit_tx = Transaction(
                 account_id=source_account.id,
                 transaction_id=f"tx-{uuid.uuid4().hex[:12]}",
-                amount=Decimal(str(request.amount)),
+                amount=amount,
                 direction="debit",
                 counterparty=f"Открытие депозита {product.name}",
                 description=f"Пополнение депозита {account_number}"
@@ -194,7 +173,7 @@ async def create_agreement(
             client_id=client.id,
             account_number=account_number,
             account_type="deposit",
-            balance=Decimal(str(request.amount)),
+            balance=amount,
             status="active"
         )
         db.add(deposit_account)
@@ -205,7 +184,7 @@ async def create_agreement(
         credit_tx = Transaction(
             account_id=deposit_account.id,
             transaction_id=f"tx-{uuid.uuid4().hex[:12]}",
-            amount=Decimal(str(request.amount)),
+            amount=amount,
             direction="credit",
             counterparty="Начальное пополнение",
             description=f"Открытие депозита{' из счета ' + request.source_account_id if request.source_account_id else ''}"
@@ -220,7 +199,7 @@ async def create_agreement(
         )
         capital = capital_result.scalar_one_or_none()
         
-        if capital and capital.capital < Decimal(str(request.amount)):
+        if capital and capital.capital < amount:
             raise HTTPException(400, "Insufficient bank capital for loan")
         
         # Создать кредитный счет
@@ -230,7 +209,7 @@ async def create_agreement(
             client_id=client.id,
             account_number=account_number,
             account_type="loan",
-            balance=Decimal(str(request.amount)),
+            balance=amount,
             status="active"
         )
         db.add(loan_account)
@@ -239,8 +218,8 @@ async def create_agreement(
         
         # Уменьшить капитал банка
         if capital:
-            capital.capital -= Decimal(str(request.amount))
-            capital.total_loans += Decimal(str(request.amount))
+            capital.capital -= amount
+            capital.total_loans += amount
         
     elif product.product_type == "card":
         # Карта: ТРЕБУЕТСЯ пополнение из существующего счета (если amount > 0)
@@ -251,7 +230,7 @@ async def create_agreement(
         account_number = f"408{uuid.uuid4().hex[:15]}"  # 408 - карта
         
         # Пополнить карту если указана сумма
-        initial_balance = Decimal("0")
+        initial_balance = ZERO_AMOUNT
         if request.source_account_id and request.amount > 0:
             source_acc_id = int(request.source_account_id.replace("acc-", ""))
             source_acc_result = await db.execute(
@@ -262,24 +241,24 @@ async def create_agreement(
             if not source_account:
                 raise HTTPException(404, "Source account not found")
             
-            if source_account.balance < Decimal(str(request.amount)):
+            if source_account.balance < amount:
                 raise HTTPException(400, f"Insufficient funds. Available: {source_account.balance}, Required: {request.amount}")
             
             # Списать со source account
-            source_account.balance -= Decimal(str(request.amount))
+            source_account.balance -= amount
             
             # Создать транзакцию списания
             debit_tx = Transaction(
                 account_id=source_account.id,
                 transaction_id=f"tx-{uuid.uuid4().hex[:12]}",
-                amount=Decimal(str(request.amount)),
+                amount=amount,
                 direction="debit",
                 counterparty=f"Пополнение карты {product.name}",
                 description=f"Пополнение карты {account_number}"
             )
             db.add(debit_tx)
             
-            initial_balance = Decimal(str(request.amount))
+            initial_balance = amount
         
         card_account = Account(
             client_id=client.id,
@@ -310,7 +289,7 @@ async def create_agreement(
         client_id=client.id,
         product_id=product.id,
         account_id=account_id,
-        amount=Decimal(str(request.amount)),
+        amount=amount,
         status="active",
         start_date=datetime.utcnow(),
         end_date=end_date
@@ -318,17 +297,6 @@ async def create_agreement(
     
     db.add(agreement)
     await db.commit()
-    await db.refresh(agreement)
-    
-    # Получить номер счета
-    account_number = None
-    if account_id:
-        account_result = await db.execute(
-            select(Account).where(Account.id == account_id)
-        )
-        account = account_result.scalar_one_or_none()
-        if account:
-            account_number = account.account_number
     
     return {
         "data": {
@@ -351,28 +319,20 @@ async def create_agreement(
 @router.get("/{agreement_id}", summary="Получить договор")
 async def get_agreement(
     agreement_id: str,
-    current_client: dict = Depends(get_current_client),
+    client_id: int = Depends(get_current_client_id),
     db: AsyncSession = Depends(get_db)
 ):
     """
     Получить детали договора
     """
-    # Найти клиента
-    result = await db.execute(
-        select(Client).where(Client.person_id == current_client["client_id"])
-    )
-    client = result.scalar_one_or_none()
-    
-    if not client:
-        raise HTTPException(404, "Client not found")
-    
-    # Найти договор
+    # Найти договор клиента вместе с продуктом и счетом одним запросом
     agreement_result = await db.execute(
-        select(ProductAgreement, Product)
+        select(ProductAgreement, Product, Account.account_number, Account.balance)
         .join(Product, ProductAgreement.product_id == Product.id)
+        .outerjoin(Account, ProductAgreement.account_id == Account.id)
         .where(
             ProductAgreement.agreement_id == agreement_id,
-            ProductAgreement.client_id == client.id
+            ProductAgreement.client_id == client_id
         )
     )
     
@@ -381,19 +341,8 @@ async def get_agreement(
     if not agreement_data:
         raise HTTPException(404, "Agreement not found")
     
-    agreement, product = agreement_data
-    
-    # Получить счет
-    account_number = None
-    account_balance = None
-    if agreement.account_id:
-        account_result = await db.execute(
-            select(Account).where(Account.id == agreement.account_id)
-        )
-        account = account_result.scalar_one_or_none()
-        if account:
-            account_number = account.account_number
-            account_balance = float(account.balance)
+    agreement, product, account_number, balance = agreement_data
+    account_balance = float(balance) if balance is not None else None
     
     return {
         "data": {
@@ -422,7 +371,7 @@ class CloseAgreementRequest(BaseModel):
 async def close_agreement(
     agreement_id: str,
     request: Optional[CloseAgreementRequest] = None,
-    current_client: dict = Depends(get_current_client),
+    client_id: int = Depends(get_current_client_id),
     db: AsyncSession = Depends(get_db)
 ):
     """
@@ -432,22 +381,13 @@ async def close_agreement(
     - Кредит: погасить задолженность из указанного счета
     - Карта: заблокировать
     """
-    # Найти клиента
-    result = await db.execute(
-        select(Client).where(Client.person_id == current_client["client_id"])
-    )
-    client = result.scalar_one_or_none()
-    
-    if not client:
-        raise HTTPException(404, "Client not found")
-    
-    # Найти договор с продуктом
+    # Найти договор клиента с продуктом
     agreement_result = await db.execute(
         select(ProductAgreement, Product)
         .join(Product, ProductAgreement.product_id == Product.id)
         .where(
             ProductAgreement.agreement_id == agreement_id,
-            ProductAgreement.client_id == client.id
+            ProductAgreement.client_id == client_id
         )
     )
     
@@ -477,7 +417,7 @@ async def close_agreement(
         # Получить счет для погашения
         repay_acc_id = int(request.repayment_account_id.replace("acc-", ""))
         repay_result = await db.execute(
-            select(Account).where(Account.id == repay_acc_id, Account.client_id == client.id)
+            select(Account).where(Account.id == repay_acc_id, Account.client_id == agreement.client_id)
         )
         repayment_account = repay_result.scalar_one_or_none()
         
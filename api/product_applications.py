@@ -14,7 +14,7 @@ import json
 
 from database import get_db
 from models import ProductApplication, Product, Client
-from services.auth_service import get_current_client
+from services.auth_service import get_current_client_model
 
 router = APIRouter(
     prefix="/product-application", 
@@ -56,7 +56,7 @@ class ProductApplicationResponse(BaseModel):
 @router.post("", status_code=201)
 async def create_product_application(
     request: ProductApplicationRequest,
-    current_client: dict = Depends(get_current_client),
+    client: Client = Depends(get_current_client_model),
     db: AsyncSession = Depends(get_db)
 ):
     """
@@ -132,18 +132,6 @@ async def create_product_application(
     }
     ```
     """
-    if not current_client:
-        raise HTTPException(401, "Unauthorized")
-    
-    # Найти клиента
-    result = await db.execute(
-        select(Client).where(Client.person_id == current_client["client_id"])
-    )
-    client = result.scalar_one_or_none()
-    
-    if not client:
-        raise HTTPException(404, "Client not found")
-    
     # Найти продукт
     product_result = await db.execute(
         select(Product).where(Product.product_id == request.product_id)
@@ -156,15 +144,18 @@ async def create_product_application(
     if not product.is_active:
         raise HTTPException(400, "Product is not available")
     
+    # Запрошенная сумма как Decimal, вычисляется один раз
+    requested_amount = Decimal(str(request.requested_amount))
+    
     # Проверить минимальную сумму
-    if product.min_amount and Decimal(str(request.requested_amount)) < product.min_amount:
+    if product.min_amount and requested_amount < product.min_amount:
         raise HTTPException(
             400, 
             f"Requested amount must be at least {product.min_amount}"
         )
     
     # Проверить максимальную сумму
-    if product.max_amount and Decimal(str(request.requested_amount)) > product.max_amount:
+    if product.max_amount and requested_amount > product.max_amount:
         raise HTTPException(
             400, 
             f"Requested amount must not exceed {product.max_amount}"
@@ -177,7 +168,7 @@ async def create_product_application(
         application_id=application_id,
         client_id=client.id,
         product_id=product.id,
-        requested_amount=Decimal(str(request.requested_amount)),
+        requested_amount=requested_amount,
         requested_term_months=request.requested_term_months or product.term_months,
         status="pending",
         application_data=json.dumps(request.application_data) if request.application_data else None,
@@ -186,7 +177,6 @@ async def create_product_application(
     
     db.add(application)
     await db.commit()
-    await db.refresh(application)
     
     return {
         "data": {
@@ -211,7 +201,7 @@ async def create_product_application(
 @router.get("")
 async def get_product_applications(
     status: Optional[str] = None,
-    current_client: dict = Depends(get_current_client),
+    client: Client = Depends(get_current_client_model),
     db: AsyncSession = Depends(get_db)
 ):
     """
@@ -223,18 +213,6 @@ async def get_product_applications(
     Query params:
     - status: фильтр по статусу (pending, approved, rejected, cancelled)
     """
-    if not current_client:
-        raise HTTPException(401, "Unauthorized")
-    
-    # Найти клиента
-    result = await db.execute(
-        select(Client).where(Client.person_id == current_client["client_id"])
-    )
-    client = result.scalar_one_or_none()
-    
-    if not client:
-        raise HTTPException(404, "Client not found")
-    
     # Получить заявки
     query = select(ProductApplication, Product).join(
         Product, ProductApplication.product_id == Product.id
@@ -286,7 +264,7 @@ async def get_product_applications(
 @router.get("/{application_id}")
 async def get_product_application(
     application_id: str,
-    current_client: dict = Depends(get_current_client),
+    client: Client = Depends(get_current_client_model),
     db: AsyncSession = Depends(get_db)
 ):
     """
@@ -295,18 +273,6 @@ async def get_product_application(
     OpenBanking Russia Products API v1.3.1
     GET /product-applications/{productApplicationId}
     """
-    if not current_client:
-        raise HTTPException(401, "Unauthorized")
-    
-    # Найти клиента
-    result = await db.execute(
-        select(Client).where(Client.person_id == current_client["client_id"])
-    )
-    client = result.scalar_one_or_none()
-    
-    if not client:
-        raise HTTPException(404, "Client not found")
-    
     # Найти заявку
     app_result = await db.execute(
         select(ProductApplication, Product).join(
@@ -366,7 +332,7 @@ async def get_product_application(
 @router.delete("/{application_id}")
 async def delete_product_application(
     application_id: str,
-    current_client: dict = Depends(get_current_client),
+    client: Client = Depends(get_current_client_model),
     db: AsyncSession = Depends(get_db)
 ):
     """
@@ -377,18 +343,6 @@ async def delete_product_application(
     
     Клиент может отозвать заявку только если она в статусе 'pending'
     """
-    if not current_client:
-        raise HTTPException(401, "Unauthorized")
-    
-    # Найти клиента
-    result = await db.execute(
-        select(Client).where(Client.person_id == current_client["client_id"])
-    )
-    client = result.scalar_one_or_none()
-    
-    if not client:
-        raise HTTPException(404, "Client not found")
-    
     # Найти заявку
     app_result = await db.execute(
         select(ProductApplication).where(
@@ -411,7 +365,6 @@ async def delete_product_application(
     
     # Отменить заявку
     application.status = "cancelled"
-    application.updated_at = datetime.utcnow()
     
     await db.commit()
     
@@ -82,7 +82,6 @@ async def create_product_offer_consent(
     
     db.add(consent)
     await db.commit()
-    await db.refresh(consent)
     
     return {
         "data": {
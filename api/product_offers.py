@@ -85,7 +85,6 @@ async def create_product_offer(
     
     db.add(offer)
     await db.commit()
-    await db.refresh(offer)
     
     return {
         "data": {
@@ -140,7 +140,6 @@ async def create_vrp_consent(
     
     db.add(consent)
     await db.commit()
-    await db.refresh(consent)
     
     return {
         "data": {
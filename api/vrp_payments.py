@@ -138,7 +138,6 @@ async def create_vrp_payment(
     
     db.add(vrp_payment)
     await db.commit()
-    await db.refresh(vrp_payment)
     
     return {
         "data": {
@@ -24,6 +24,12 @@ class BankConfig(BaseSettings):
     
     # === DATABASE ===
     DATABASE_URL: str
+    DB_POOL_SIZE: int
+    DB_MAX_OVERFLOW: int
+    DB_POOL_RECYCLE_SECONDS: int
+    DB_STATEMENT_CACHE_SIZE: int  # кэш prepared statements asyncpg
+    DB_PREPARED_STATEMENT_CACHE_SIZE: int  # кэш prepared statements SQLAlchemy
+    DB_TCP_KEEPALIVES_IDLE: int  # секунды до TCP keepalive на стороне PostgreSQL
     
     # === SECURITY ===
     SECRET_KEY: str
@@ -43,9 +49,21 @@ class BankConfig(BaseSettings):
     ADMIN_PASSWORD: str
     DEMO_CLIENT_PASSWORD: str
     
+    # === HTTP CLIENT (запросы к другим банкам) ===
+    HTTP_TIMEOUT_SECONDS: float
+    HTTP_MAX_CONNECTIONS: int
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int
+    MULTIBANK_BATCH_MAX_TARGETS: int  # счетов в одном batch-запросе балансов
+    MULTIBANK_BATCH_CONCURRENCY: int  # одновременных запросов к банкам на один batch
+    
     # === CACHE ===
     REDIS_URL: str = "redis://localhost:6379"
     CACHE_EXPIRE_SECONDS: int = 300
+    REDIS_MAX_CONNECTIONS: int  # размер общего пула соединений Redis
+    REDIS_POOL_TIMEOUT_SECONDS: float  # ожидание свободного соединения, затем ошибка (кэш обходится)
+    CACHE_INVALIDATION_BATCH_SIZE: int  # ключей на SCAN/UNLINK при инвалидации
+    BANK_CACHE_EXPIRE_SECONDS: int  # справочник банков почти не меняется
+    PAYMENT_CACHE_EXPIRE_SECONDS: int  # короткий TTL для опроса статуса платежа
     
     # Поля, используемые только в docker-compose, но не в приложении
     # Добавлены для избежания ошибок валидации
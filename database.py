@@ -7,6 +7,8 @@ from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sess
 from typing import AsyncGenerator
 import os
 
+from config import config
+
 # Database URL from environment
 DATABASE_URL = os.getenv(
     "DATABASE_URL",
@@ -20,7 +22,21 @@ else:
     ASYNC_DATABASE_URL = DATABASE_URL
 
 # Create async engine
-engine = create_async_engine(ASYNC_DATABASE_URL, echo=True)
+engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    echo=True,
+    pool_size=config.DB_POOL_SIZE,
+    max_overflow=config.DB_MAX_OVERFLOW,
+    pool_pre_ping=True,
+    pool_recycle=config.DB_POOL_RECYCLE_SECONDS,
+    connect_args={
+        "statement_cache_size": config.DB_STATEMENT_CACHE_SIZE,
+        "prepared_statement_cache_size": config.DB_PREPARED_STATEMENT_CACHE_SIZE,
+        "server_settings": {
+            "tcp_keepalives_idle": str(config.DB_TCP_KEEPALIVES_IDLE),
+        },
+    },
+)
 
 # Create async session maker
 AsyncSessionLocal = async_sessionmaker(
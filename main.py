@@ -22,8 +22,9 @@ from api import (
 
 # FastAPI Cache imports
 from fastapi_cache import FastAPICache
-from fastapi_cache.backends.redis import RedisBackend
 from redis import asyncio as aioredis
+from services.cache_utils import TaggedRedisBackend
+import httpx
 
 
 @asynccontextmanager
@@ -33,21 +34,38 @@ async def lifespan(app: FastAPI):
     print(f"🏦 Starting {config.BANK_NAME} ({config.BANK_CODE})")
     print(f"📍 Database: {config.DATABASE_URL.split('@')[1] if '@' in config.DATABASE_URL else 'local'}")
 
-    # Initialize app.state.tokens for external banks
+    # Initialize app.state.tokens for external banks (always a dict, handlers read it directly)
     app.state.tokens = await get_external_bank_tokens()
     print(f"🔑 Initialized tokens for {len(app.state.tokens)} external bank(s)")
 
+    # Общий HTTP клиент для запросов к другим банкам (keep-alive пул соединений)
+    app.state.http_client = httpx.AsyncClient(
+        timeout=config.HTTP_TIMEOUT_SECONDS,
+        limits=httpx.Limits(
+            max_connections=config.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=config.HTTP_MAX_KEEPALIVE_CONNECTIONS
+        )
+    )
+
     # Initialize Redis cache
+    # Клиент (с пулом соединений) общий для кэша и инвалидации: app.state.redis
+    app.state.redis = None
     try:
-        redis_client = await aioredis.from_url(
+        # BlockingConnectionPool: при исчерпании пула запрос ждет соединение
+        # не дольше REDIS_POOL_TIMEOUT_SECONDS, затем кэш обходится и идет запрос в БД
+        redis_pool = aioredis.BlockingConnectionPool.from_url(
             config.REDIS_URL,
             encoding="utf-8",
-            decode_responses=True
+            decode_responses=True,
+            max_connections=config.REDIS_MAX_CONNECTIONS,
+            timeout=config.REDIS_POOL_TIMEOUT_SECONDS
         )
+        redis_client = aioredis.Redis(connection_pool=redis_pool)
         FastAPICache.init(
-            RedisBackend(redis_client),
+            TaggedRedisBackend(redis_client, prefix="banking-box"),
             prefix="banking-box"
         )
+        app.state.redis = redis_client
         print(f"💾 Initialized Redis cache at {config.REDIS_URL}")
     except Exception as e:
         print(f"⚠️  Warning: Could not connect to Redis: {e}")
@@ -57,6 +75,10 @@ async def lifespan(app: FastAPI):
 
     # Shutdown
     print(f"🛑 Stopping {config.BANK_NAME}")
+    await app.state.http_client.aclose()
+    if app.state.redis is not None:
+        await app.state.redis.close()
+        await app.state.redis.connection_pool.disconnect()
     await engine.dispose()
 
 
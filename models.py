@@ -1,7 +1,7 @@
 """
 SQLAlchemy модели для банка
 """
-from sqlalchemy import Column, Integer, String, Numeric, DateTime, ForeignKey, Text, ARRAY, Boolean, UniqueConstraint
+from sqlalchemy import Column, Integer, String, Numeric, DateTime, ForeignKey, Text, ARRAY, Boolean, UniqueConstraint, func
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -92,10 +92,11 @@ class Transaction(Base):
 class BankSettings(Base):
     """Настройки банка"""
     __tablename__ = "bank_settings"
+    __mapper_args__ = {"eager_defaults": True}  # updated_at через RETURNING
     
     key = Column(String(100), primary_key=True)
     value = Column(Text)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
 
 
 class AuthToken(Base):
@@ -292,6 +293,7 @@ class ProductAgreementConsent(Base):
 class Payment(Base):
     """Платеж (OpenBanking Russia Payments API)"""
     __tablename__ = "payments"
+    __mapper_args__ = {"eager_defaults": True}  # даты создания/обновления через RETURNING
     
     id = Column(Integer, primary_key=True)
     payment_id = Column(String(100), unique=True, nullable=False)
@@ -304,8 +306,8 @@ class Payment(Base):
     description = Column(Text)
     status = Column(String(50), default="AcceptedSettlementInProcess")
     # AcceptedSettlementInProcess, AcceptedSettlementCompleted, Rejected
-    creation_date_time = Column(DateTime, default=datetime.utcnow)
-    status_update_date_time = Column(DateTime, default=datetime.utcnow)
+    creation_date_time = Column(DateTime, server_default=func.now())
+    status_update_date_time = Column(DateTime, server_default=func.now())
     
     # Interbank payment fields
     payment_direction = Column(Text, nullable=True)
@@ -343,6 +345,7 @@ class InterbankTransfer(Base):
 class BankCapital(Base):
     """Капитал банка (для экономической модели)"""
     __tablename__ = "bank_capital"
+    __mapper_args__ = {"eager_defaults": True}  # updated_at через RETURNING
     
     id = Column(Integer, primary_key=True)
     bank_code = Column(String(100), unique=True, nullable=False)
@@ -350,7 +353,7 @@ class BankCapital(Base):
     initial_capital = Column(Numeric(15, 2), nullable=False)  # Начальный капитал
     total_deposits = Column(Numeric(15, 2), default=0)  # Сумма депозитов клиентов
     total_loans = Column(Numeric(15, 2), default=0)  # Выданные кредиты
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
 
 
 class Product(Base):
@@ -406,6 +409,7 @@ class KeyRateHistory(Base):
 class CustomerLead(Base):
     """Лид (потенциальный клиент) - Products API v1.3.1"""
     __tablename__ = "customer_leads"
+    __mapper_args__ = {"eager_defaults": True}  # updated_at через RETURNING
 
     id = Column(Integer, primary_key=True)
     customer_lead_id = Column(String(100), unique=True, nullable=False)
@@ -425,7 +429,7 @@ class CustomerLead(Base):
     estimated_income = Column(Numeric(15, 2))
 
     created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
     contacted_at = Column(DateTime)
     converted_to_client_id = Column(Integer, ForeignKey("clients.id"))  # если конвертировался
 
@@ -433,6 +437,7 @@ class CustomerLead(Base):
 class ProductOffer(Base):
     """Персональное предложение по продукту - Products API v1.3.1"""
     __tablename__ = "product_offers"
+    __mapper_args__ = {"eager_defaults": True}  # updated_at через RETURNING
 
     id = Column(Integer, primary_key=True)
     offer_id = Column(String(100), unique=True, nullable=False)
@@ -451,7 +456,7 @@ class ProductOffer(Base):
     rejection_reason = Column(Text)
 
     created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
     sent_at = Column(DateTime)
     viewed_at = Column(DateTime)
     responded_at = Column(DateTime)
@@ -481,6 +486,7 @@ class ProductOfferConsent(Base):
 class ProductApplication(Base):
     """Заявка клиента на банковский продукт - Products API v1.3.1"""
     __tablename__ = "product_applications"
+    __mapper_args__ = {"eager_defaults": True}  # updated_at через RETURNING
 
     id = Column(Integer, primary_key=True)
     application_id = Column(String(100), unique=True, nullable=False)
@@ -510,7 +516,7 @@ class ProductApplication(Base):
     reviewed_at = Column(DateTime)
     decision_at = Column(DateTime)
     created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
 
     # Relationships
     client = relationship("Client")
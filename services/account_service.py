@@ -6,6 +6,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, and_
 from typing import List, Dict, Optional
 from datetime import datetime
+import asyncio
 import httpx
 import logging
 import time
@@ -15,6 +16,9 @@ from config import config
 
 logger = logging.getLogger(__name__)
 
+# Выполняющиеся сейчас запросы счетов из внешних банков: client_person_id -> Future
+_inflight_external_accounts: Dict[str, asyncio.Future] = {}
+
 
 async def request_consent_from_external_bank(
     bank: Bank,
@@ -36,7 +40,7 @@ async def request_consent_from_external_bank(
     Returns:
         Optional[str]: consent_id если успешно, None в противном случае
     """
-    logger.info(f"Requesting consent for client {client_person_id} and bank {bank.code}")
+    logger.info("Requesting consent for client %s and bank %s", client_person_id, bank.code)
     
     try:
         should_close_client = False
@@ -93,25 +97,63 @@ async def request_consent_from_external_bank(
                     )
                     db.add(new_consent)
                     await db.commit()
-                    logger.info(f"Saved new consent {consent_id} for client {client_person_id} and bank {bank.code}")
+                    logger.info("Saved new consent %s for client %s and bank %s", consent_id, client_person_id, bank.code)
                     return consent_id
                 else:
-                    logger.warning(f"Could not extract consent_id from response: {consent_response_data}")
+                    logger.warning("Could not extract consent_id from response: %s", consent_response_data)
                     return None
             else:
-                logger.error(f"Failed to request consent from {bank.code}: HTTP {consent_response.status_code}: {consent_response.text[:200]}")
+                logger.error("Failed to request consent from %s: HTTP %s: %s", bank.code, consent_response.status_code, consent_response.text[:200])
                 return None
         except Exception as e:
-            logger.error(f"Error requesting consent from {bank.code}: {e}")
+            logger.error("Error requesting consent from %s: %s", bank.code, e)
             return None
         finally:
             if should_close_client:
                 await http_client.aclose()
     except Exception as e:
-        logger.error(f"Unexpected error in request_consent_from_external_bank for {bank.code}: {e}")
+        logger.error("Unexpected error in request_consent_from_external_bank for %s: %s", bank.code, e)
         return None
 
 
+async def _get_account_balance(
+    bank: Bank,
+    account_id: str,
+    token: str,
+    consent_id: str,
+    http_client: httpx.AsyncClient
+) -> Optional[str]:
+    """
+    Получить баланс счета во внешнем банке
+
+    Returns:
+        Optional[str]: сумма баланса или None, если получить не удалось
+    """
+    try:
+        # Add cache-busting parameter to force fresh data
+        cache_buster = int(time.time() * 1000)  # milliseconds timestamp
+        balance_response = await http_client.get(
+            f"{bank.api_url}/accounts/{account_id}/balances?_t={cache_buster}",
+            headers={
+                "Authorization": f"Bearer {token}",
+                "x-consent-id": consent_id,
+                "x-requesting-bank": config.BANK_CODE,
+                "accept": "application/json",
+                "Cache-Control": "no-cache"
+            }
+        )
+        
+        if balance_response.status_code == 200:
+            balance_data = balance_response.json()
+            balance_list = balance_data.get("data", {}).get("balance", [])
+            if balance_list:
+                return balance_list[0].get("amount", {}).get("amount")
+    except Exception as e:
+        logger.warning("Failed to get balance for account %s from %s: %s", account_id, bank.code, e)
+    
+    return None
+
+
 async def get_accounts_from_external_bank(
     bank: Bank,
     client_person_id: str,
@@ -159,34 +201,13 @@ async def get_accounts_from_external_bank(
                 data = response.json()
                 account_list = data.get("data", {}).get("account", [])
                 
-                # Для каждого счета получить баланс
-                for account in account_list:
-                    account_id = account.get("accountId")
-                    balance = None
-                    
-                    # Попытаться получить баланс
-                    try:
-                        # Add cache-busting parameter to force fresh data
-                        cache_buster = int(time.time() * 1000)  # milliseconds timestamp
-                        balance_response = await http_client.get(
-                            f"{bank.api_url}/accounts/{account_id}/balances?_t={cache_buster}",
-                            headers={
-                                "Authorization": f"Bearer {token}",
-                                "x-consent-id": consent_id,
-                                "x-requesting-bank": config.BANK_CODE,
-                                "accept": "application/json",
-                                "Cache-Control": "no-cache"
-                            }
-                        )
-                        
-                        if balance_response.status_code == 200:
-                            balance_data = balance_response.json()
-                            balance_list = balance_data.get("data", {}).get("balance", [])
-                            if balance_list:
-                                balance = balance_list[0].get("amount", {}).get("amount")
-                    except Exception as e:
-                        logger.warning(f"Failed to get balance for account {account_id} from {bank.code}: {e}")
-                    
+                # Балансы всех счетов запрашиваются параллельно
+                balances = await asyncio.gather(*(
+                    _get_account_balance(bank, account.get("accountId"), token, consent_id, http_client)
+                    for account in account_list
+                ))
+                
+                for account, balance in zip(account_list, balances):
                     accounts.append({
                         "bank_code": bank.code,
                         "bank_name": bank.name or bank.code,
@@ -197,7 +218,7 @@ async def get_accounts_from_external_bank(
             elif response.status_code == 403:
                 # Согласие недействительно
                 error_text = response.text[:200] if response.text else "Consent invalid"
-                logger.warning(f"Consent {consent_id} invalid for {bank.code}: {error_text}")
+                logger.warning("Consent %s invalid for %s: %s", consent_id, bank.code, error_text)
                 accounts.append({
                     "bank_code": bank.code,
                     "bank_name": bank.name or bank.code,
@@ -208,7 +229,7 @@ async def get_accounts_from_external_bank(
             else:
                 # Другая ошибка
                 error_text = response.text[:200] if response.text else "Unknown error"
-                logger.error(f"Failed to get accounts from {bank.code}: HTTP {response.status_code}: {error_text}")
+                logger.error("Failed to get accounts from %s: HTTP %s: %s", bank.code, response.status_code, error_text)
                 accounts.append({
                     "bank_code": bank.code,
                     "bank_name": bank.name or bank.code,
@@ -220,7 +241,7 @@ async def get_accounts_from_external_bank(
             if should_close_client:
                 await http_client.aclose()
     except httpx.TimeoutException:
-        logger.error(f"Timeout when getting accounts from {bank.code}")
+        logger.error("Timeout when getting accounts from %s", bank.code)
         accounts.append({
             "bank_code": bank.code,
             "bank_name": bank.name or bank.code,
@@ -229,7 +250,7 @@ async def get_accounts_from_external_bank(
             "error": "Timeout"
         })
     except httpx.RequestError as e:
-        logger.error(f"Request error when getting accounts from {bank.code}: {e}")
+        logger.error("Request error when getting accounts from %s: %s", bank.code, e)
         accounts.append({
             "bank_code": bank.code,
             "bank_name": bank.name or bank.code,
@@ -238,7 +259,7 @@ async def get_accounts_from_external_bank(
             "error": f"Connection error: {str(e)[:100]}"
         })
     except Exception as e:
-        logger.error(f"Unexpected error when getting accounts from {bank.code}: {e}")
+        logger.error("Unexpected error when getting accounts from %s: %s", bank.code, e)
         accounts.append({
             "bank_code": bank.code,
             "bank_name": bank.name or bank.code,
@@ -280,10 +301,22 @@ async def get_external_accounts_for_client(
         logger.info("No external banks found")
         return accounts
     
+    # Активные согласия клиента одним запросом вместо SELECT на каждый банк
+    consents_result = await db.execute(
+        select(Consent).where(
+            and_(
+                Consent.client_id_external == client_person_id,
+                Consent.bank_id.in_([bank.id for bank in external_banks]),
+                Consent.status == "active"
+            )
+        )
+    )
+    active_consents = {c.bank_id: c for c in consents_result.scalars().all()}
+    
     # Для каждого внешнего банка получить счета
     for bank in external_banks:
         if not bank.code or not bank.api_url:
-            logger.warning(f"Skipping bank {bank.code or 'unknown'}: missing code or api_url")
+            logger.warning("Skipping bank %s: missing code or api_url", bank.code or 'unknown')
             continue
         
         # Получить токен для банка
@@ -291,7 +324,7 @@ async def get_external_accounts_for_client(
         token = bank_token_info.get("token")
         
         if not token:
-            logger.warning(f"No token available for bank {bank.code}")
+            logger.warning("No token available for bank %s", bank.code)
             accounts.append({
                 "bank_code": bank.code,
                 "bank_name": bank.name or bank.code,
@@ -302,25 +335,16 @@ async def get_external_accounts_for_client(
             continue
         
         try:
-            # Получить существующее согласие из таблицы Consent
-            consent_result = await db.execute(
-                select(Consent).where(
-                    and_(
-                        Consent.client_id_external == client_person_id,
-                        Consent.bank_id == bank.id,
-                        Consent.status == "active"
-                    )
-                )
-            )
-            consent = consent_result.scalar_one_or_none()
+            # Получить существующее согласие из предзагруженных
+            consent = active_consents.get(bank.id)
             consent_id = None
             
             if consent:
                 consent_id = consent.consent_id
-                logger.info(f"Found existing consent {consent_id} for client {client_person_id} and bank {bank.code}")
+                logger.info("Found existing consent %s for client %s and bank %s", consent_id, client_person_id, bank.code)
             else:
                 # Запросить новое согласие у внешнего банка
-                logger.info(f"No consent found for client {client_person_id} and bank {bank.code}, requesting new consent")
+                logger.info("No consent found for client %s and bank %s, requesting new consent", client_person_id, bank.code)
                 consent_id = await request_consent_from_external_bank(bank, client_person_id, token, db)
             
             if not consent_id:
@@ -339,7 +363,7 @@ async def get_external_accounts_for_client(
             # Проверить, есть ли ошибка CONSENT_REQUIRED (403)
             if bank_accounts and len(bank_accounts) == 1 and bank_accounts[0].get("error") == "CONSENT_REQUIRED":
                 # Согласие недействительно, обновить статус и запросить новое
-                logger.warning(f"Consent {consent_id} failed for {bank.code}, updating status and requesting new consent")
+                logger.warning("Consent %s failed for %s, updating status and requesting new consent", consent_id, bank.code)
                 if consent:
                     consent.status = "expired"
                     consent.status_update_date_time = datetime.utcnow()
@@ -367,7 +391,7 @@ async def get_external_accounts_for_client(
                 accounts.extend(bank_accounts)
         
         except httpx.TimeoutException:
-            logger.error(f"Timeout when getting accounts from {bank.code}")
+            logger.error("Timeout when getting accounts from %s", bank.code)
             accounts.append({
                 "bank_code": bank.code,
                 "bank_name": bank.name or bank.code,
@@ -376,7 +400,7 @@ async def get_external_accounts_for_client(
                 "error": "Timeout"
             })
         except httpx.RequestError as e:
-            logger.error(f"Request error when getting accounts from {bank.code}: {e}")
+            logger.error("Request error when getting accounts from %s: %s", bank.code, e)
             accounts.append({
                 "bank_code": bank.code,
                 "bank_name": bank.name or bank.code,
@@ -385,7 +409,7 @@ async def get_external_accounts_for_client(
                 "error": f"Connection error: {str(e)[:100]}"
             })
         except Exception as e:
-            logger.error(f"Unexpected error when getting accounts from {bank.code}: {e}")
+            logger.error("Unexpected error when getting accounts from %s: %s", bank.code, e)
             accounts.append({
                 "bank_code": bank.code,
                 "bank_name": bank.name or bank.code,
@@ -396,3 +420,53 @@ async def get_external_accounts_for_client(
     
     return accounts
 
+
+async def get_external_accounts_single_flight(
+    client_person_id: str,
+    db: AsyncSession,
+    app_state_tokens: dict
+) -> List[Dict]:
+    """
+    Получить счета клиента из всех внешних банков, объединяя одновременные запросы
+
+    Если для клиента уже выполняется запрос к внешним банкам (например, после
+    инвалидации кэша пришло несколько запросов сразу), новый запрос не делает
+    собственных HTTP вызовов, а дожидается результата уже запущенного.
+
+    Args:
+        client_person_id: ID клиента (person_id)
+        db: Database session
+        app_state_tokens: Словарь с токенами внешних банков из app.state.tokens
+
+    Returns:
+        List[Dict]: Список счетов в формате get_external_accounts_for_client
+    """
+    future = _inflight_external_accounts.get(client_person_id)
+    if future is not None:
+        logger.info("Joining in-flight external accounts request for client %s", client_person_id)
+        try:
+            return list(await asyncio.shield(future))
+        except asyncio.CancelledError:
+            # Отменен собственный запрос - пробрасываем отмену дальше
+            if not future.cancelled() or asyncio.current_task().cancelling():
+                raise
+        # Отменен запрос-лидер (например, клиент отключился) - получаем счета сами
+        logger.info("In-flight external accounts request for client %s was cancelled, fetching again", client_person_id)
+        return await get_external_accounts_for_client(client_person_id, db, app_state_tokens)
+
+    future = asyncio.get_running_loop().create_future()
+    _inflight_external_accounts[client_person_id] = future
+    try:
+        accounts = await get_external_accounts_for_client(client_person_id, db, app_state_tokens)
+        future.set_result(accounts)
+        return accounts
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        # Пометить исключение как полученное, если никто не ждал результата
+        future.exception()
+        raise
+    finally:
+        _inflight_external_accounts.pop(client_person_id, None)
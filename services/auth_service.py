@@ -10,9 +10,10 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pathlib import Path
 import httpx
 from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from config import config
-from models import Bank
+from models import Bank, Client
 from database import get_db
 
 # Password hashing
@@ -145,10 +146,77 @@ async def get_current_client(
     
     return {
         "client_id": payload.get("sub"),
+        "cid": payload.get("cid"),
         "type": "client"
     }
 
 
+async def resolve_current_client_id(current_client: Optional[dict], db: AsyncSession) -> int:
+    """
+    Внутренний Client.id текущего клиента
+
+    Токен подписан, поэтому claim "cid" используется без запроса к БД.
+    Поиск по person_id остается только для токенов, выпущенных до появления
+    "cid". После пересоздания БД нужно сменить SECRET_KEY, чтобы старые
+    токены с "cid" перестали приниматься.
+
+    Используется через dependency get_current_client_id; напрямую - только
+    там, где клиент нужен после проверки кэша (GET /payments/{id})
+    """
+    if not current_client:
+        raise HTTPException(401, "Unauthorized")
+
+    if current_client.get("cid") is not None:
+        return current_client["cid"]
+
+    result = await db.execute(
+        select(Client.id).where(Client.person_id == current_client["client_id"])
+    )
+    client_id = result.scalar_one_or_none()
+
+    if client_id is None:
+        raise HTTPException(404, "Client not found")
+
+    return client_id
+
+
+async def get_current_client_id(
+    current_client: Optional[dict] = Depends(get_current_client),
+    db: AsyncSession = Depends(get_db)
+) -> int:
+    """
+    Dependency для получения Client.id текущего клиента (без загрузки модели)
+    """
+    return await resolve_current_client_id(current_client, db)
+
+
+async def get_current_client_model(
+    current_client: Optional[dict] = Depends(get_current_client),
+    db: AsyncSession = Depends(get_db)
+) -> Client:
+    """
+    Dependency для получения модели Client текущего клиента
+
+    С claim "cid" клиент загружается по первичному ключу, для старых
+    токенов - по person_id
+    """
+    if not current_client:
+        raise HTTPException(401, "Unauthorized")
+
+    if current_client.get("cid") is not None:
+        client = await db.get(Client, current_client["cid"])
+    else:
+        result = await db.execute(
+            select(Client).where(Client.person_id == current_client["client_id"])
+        )
+        client = result.scalar_one_or_none()
+
+    if not client:
+        raise HTTPException(404, "Client not found")
+
+    return client
+
+
 async def get_current_bank(
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ) -> Optional[dict]:
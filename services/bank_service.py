@@ -0,0 +1,76 @@
+"""
+Сервис справочника банков
+Строки banks кэшируются в Redis (cache-aside): это справочные данные,
+которые меняются только при деплое
+"""
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from redis import asyncio as aioredis
+from typing import Dict, Iterable, Optional
+import json
+import logging
+
+from models import Bank
+from config import config
+
+logger = logging.getLogger(__name__)
+
+# Версия формата ключей: смена версии сбрасывает весь кэш банков разом
+BANK_CACHE_VERSION = "v1"
+
+# Поля, которые кладутся в кэш (api_user/api_secret в Redis не храним)
+_CACHED_FIELDS = ("id", "code", "name", "external", "api_url")
+
+
+def bank_cache_key(code: str, namespace: str = "banking-box") -> str:
+    """Ключ Redis для банка по коду"""
+    return f"{namespace}:{BANK_CACHE_VERSION}:bank:code:{code}"
+
+
+async def get_banks_by_codes(
+    db: AsyncSession,
+    redis_client: Optional[aioredis.Redis],
+    codes: Iterable[str]
+) -> Dict[str, Bank]:
+    """
+    Получить банки по кодам: сначала из Redis (один MGET), недостающие - из БД
+
+    Банки возвращаются как несвязанные с сессией объекты Bank только
+    с полями из _CACHED_FIELDS - они предназначены для чтения.
+
+    Returns:
+        Словарь code -> Bank (банков, которых нет в БД, в словаре нет)
+    """
+    codes = list(dict.fromkeys(codes))
+    banks: Dict[str, Bank] = {}
+
+    if redis_client is not None:
+        try:
+            cached = await redis_client.mget([bank_cache_key(code) for code in codes])
+            for code, raw in zip(codes, cached):
+                if raw is not None:
+                    banks[code] = Bank(**json.loads(raw))
+        except Exception as e:
+            logger.warning("Could not read banks from cache: %s", e)
+
+    missing = [code for code in codes if code not in banks]
+    if not missing:
+        return banks
+
+    # Только нужные колонки, без ORM-гидрации и identity map
+    result = await db.execute(
+        select(*(getattr(Bank, field) for field in _CACHED_FIELDS)).where(Bank.code.in_(missing))
+    )
+    loaded = {row.code: dict(row._mapping) for row in result}
+    banks.update({code: Bank(**fields) for code, fields in loaded.items()})
+
+    if redis_client is not None and loaded:
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                for code, fields in loaded.items():
+                    pipe.set(bank_cache_key(code), json.dumps(fields), ex=config.BANK_CACHE_EXPIRE_SECONDS)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning("Could not write banks to cache: %s", e)
+
+    return banks
@@ -3,7 +3,47 @@ Cache utilities for FastAPI-Cache
 """
 from typing import Any, Optional
 from fastapi import Request, Response
+from fastapi_cache.backends.redis import RedisBackend
 from redis import asyncio as aioredis
+import logging
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+# Часть ключа кэша, после которой идет client_id
+CLIENT_KEY_MARKER = ":client:"
+
+
+def client_cache_tag(client_id: str, namespace: str = "banking-box") -> str:
+    """
+    Name of the Redis set that holds all cache keys of a client.
+
+    TaggedRedisBackend adds every stored client key to this set, so
+    invalidation reads the set instead of scanning the whole keyspace.
+    """
+    return f"{namespace}:tag:client:{client_id}"
+
+
+def static_key_builder(
+    func,
+    namespace: str = "",
+    *,
+    request: Request = None,
+    response: Response = None,
+    args: tuple = (),
+    kwargs: dict = None,
+) -> str:
+    """
+    Key builder for responses that do not depend on the caller or arguments.
+
+    The default fastapi-cache key includes kwargs (e.g. the db session),
+    which differ on every request and would make the cache never hit.
+
+    Key format: namespace:function_name
+    Example: banking-box::get_banks
+    """
+    return f"{namespace}:{func.__name__}"
 
 
 def client_key_builder(
@@ -22,46 +62,123 @@ def client_key_builder(
 
     Key format: namespace:function_name:client_id
     Example: banking-box:get_external_accounts:CLIENT123
-    """
-    kwargs = kwargs or {}
 
-    # Extract client_id from kwargs (passed from get_current_client dependency)
-    current_client = kwargs.get("current_client", {})
-    client_id = current_client.get("client_id", "unknown")
+    The key is registered in the client's tag set when a value is stored
+    (see TaggedRedisBackend).
+    """
+    client_id = _current_client_id(kwargs)
 
     # Build cache key
-    cache_key = f"{namespace}:{func.__name__}:client:{client_id}"
+    return f"{namespace}:{func.__name__}{CLIENT_KEY_MARKER}{client_id}"
+
+
+def client_path_key_builder(
+    func,
+    namespace: str = "",
+    *,
+    request: Request = None,
+    response: Response = None,
+    args: tuple = (),
+    kwargs: dict = None,
+) -> str:
+    """
+    Key builder for per-resource endpoints: client_id plus the request path.
+
+    Key format: namespace:function_name:client:client_id:path
+    Example: banking-box:get_payment:client:CLIENT123:/payments/pay-1a2b
+
+    The key is registered in the client's tag set when a value is stored
+    (see TaggedRedisBackend).
+    """
+    client_id = _current_client_id(kwargs)
+    path = request.url.path if request is not None else ""
+
+    return f"{namespace}:{func.__name__}{CLIENT_KEY_MARKER}{client_id}:{path}"
+
+
+def _current_client_id(kwargs: Optional[dict]) -> str:
+    """Extract client_id from kwargs (passed from get_current_client dependency)"""
+    current_client = (kwargs or {}).get("current_client") or {}
+    return current_client.get("client_id", "unknown")
+
+
+def _client_id_from_key(key: str) -> Optional[str]:
+    """Client id of a key built by client_key_builder/client_path_key_builder, None otherwise"""
+    if CLIENT_KEY_MARKER not in key:
+        return None
+    return key.split(CLIENT_KEY_MARKER, 1)[1].split(":", 1)[0]
+
+
+class TaggedRedisBackend(RedisBackend):
+    """
+    Redis backend that registers client keys in the client's tag set.
+
+    Registration happens only when a value is stored: SET, SADD and EXPIRE
+    go in one pipelined round-trip, cache hits cost a single GET.
+    """
+
+    def __init__(self, redis: aioredis.Redis, prefix: str = "banking-box"):
+        super().__init__(redis)
+        self.prefix = prefix
 
-    return cache_key
+    async def set(self, key: str, value: Any, expire: Optional[int] = None) -> None:
+        client_id = _client_id_from_key(key)
+        if client_id is None:
+            await super().set(key, value, expire)
+            return
 
+        tag = client_cache_tag(client_id, self.prefix)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.set(key, value, ex=expire)
+            pipe.sadd(tag, key)
+            # Тег живет не меньше любого ключа клиента
+            pipe.expire(tag, max(expire or 0, config.CACHE_EXPIRE_SECONDS))
+            await pipe.execute()
 
-async def invalidate_client_cache(redis_client: aioredis.Redis, client_id: str, namespace: str = "banking-box"):
+
+async def invalidate_client_cache(redis_client: Optional[aioredis.Redis], client_id: str, namespace: str = "banking-box"):
     """
     Invalidate all cached data for a specific client.
 
     Args:
-        redis_client: Async Redis client instance
+        redis_client: Shared async Redis client (app.state.redis), None if cache is disabled
         client_id: Client's person_id
         namespace: Cache namespace (default: banking-box)
 
     Usage:
-        await invalidate_client_cache(redis_client, "CLIENT123")
+        await invalidate_client_cache(request.app.state.redis, "CLIENT123")
     """
-    pattern = f"{namespace}:*:client:{client_id}"
+    if redis_client is None:
+        return 0
 
-    # Find all keys matching the pattern
-    keys = []
-    async for key in redis_client.scan_iter(match=pattern):
-        keys.append(key)
+    # Keys of the client are collected in its tag set by TaggedRedisBackend
+    tag = client_cache_tag(client_id, namespace)
+    keys = await redis_client.smembers(tag)
 
-    # Delete all matching keys
+    # Delete all client keys together with the tag
+    # (UNLINK освобождает память в фоне и не блокирует Redis)
     if keys:
-        await redis_client.delete(*keys)
+        await redis_client.unlink(*keys, tag)
         return len(keys)
 
     return 0
 
 
+async def invalidate_client_cache_in_background(redis_client: Optional[aioredis.Redis], client_id: str, namespace: str = "banking-box"):
+    """
+    Invalidate client cache from a background task.
+
+    Errors are logged instead of raised: the response has already been sent.
+
+    Usage:
+        background_tasks.add_task(invalidate_client_cache_in_background, request.app.state.redis, "CLIENT123")
+    """
+    try:
+        await invalidate_client_cache(redis_client, client_id, namespace)
+    except Exception as e:
+        logger.warning("Could not invalidate cache for client_id=%s: %s", client_id, e)
+
+
 async def invalidate_all_cache(redis_client: aioredis.Redis, namespace: str = "banking-box"):
     """
     Invalidate all cached data in the namespace.
@@ -74,15 +191,19 @@ async def invalidate_all_cache(redis_client: aioredis.Redis, namespace: str = "b
         await invalidate_all_cache(redis_client)
     """
     pattern = f"{namespace}:*"
+    batch_size = config.CACHE_INVALIDATION_BATCH_SIZE
 
-    # Find all keys matching the pattern
+    # Find all keys matching the pattern (larger SCAN pages, fewer round-trips)
     keys = []
-    async for key in redis_client.scan_iter(match=pattern):
+    async for key in redis_client.scan_iter(match=pattern, count=batch_size):
         keys.append(key)
 
-    # Delete all matching keys
+    # Delete all matching keys in batches within one pipelined round-trip
     if keys:
-        await redis_client.delete(*keys)
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for start in range(0, len(keys), batch_size):
+                pipe.unlink(*keys[start:start + batch_size])
+            await pipe.execute()
         return len(keys)
 
     return 0
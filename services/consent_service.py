@@ -3,7 +3,7 @@
 Соответствует OpenBanking Russia Account-Consents API v2.1
 """
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_
+from sqlalchemy import select, update, and_
 from datetime import datetime, timedelta
 from typing import Optional, List
 import uuid
@@ -149,9 +149,6 @@ class ConsentService:
             db.add(notification)
         
         await db.commit()
-        await db.refresh(consent_request)
-        if consent:
-            await db.refresh(consent)
         
         return (consent_request, consent)
     
@@ -219,7 +216,6 @@ class ConsentService:
             consent_request.responded_at = datetime.utcnow()
             
             await db.commit()
-            await db.refresh(consent)
             
             return ("approved", consent)
             
@@ -298,7 +294,6 @@ class ConsentService:
             consent_request.responded_at = datetime.utcnow()
             
             await db.commit()
-            await db.refresh(consent)
             
             return ("Authorized", consent)
             
@@ -313,38 +308,32 @@ class ConsentService:
     async def revoke_consent(
         db: AsyncSession,
         consent_id: str,
-        client_person_id: str
+        client_id: int
     ) -> bool:
-        """Отзыв согласия клиентом"""
-        # Получить client
-        client_result = await db.execute(
-            select(Client).where(Client.person_id == client_person_id)
-        )
-        client = client_result.scalar_one_or_none()
-        
-        if not client:
-            return False
+        """Отзыв согласия клиентом (client_id - внутренний Client.id)"""
+        now = datetime.utcnow()
         
-        # Найти согласие
+        # Один UPDATE ... RETURNING вместо поиска клиента, согласия и записи
         result = await db.execute(
-            select(Consent).where(
+            update(Consent)
+            .where(
                 and_(
                     Consent.consent_id == consent_id,
-                    Consent.client_id == client.id,
+                    Consent.client_id == client_id,
                     Consent.status == "active"
                 )
             )
+            .values(
+                status="Revoked",  # OpenBanking формат с заглавной буквы
+                status_update_date_time=now,
+                revoked_at=now
+            )
+            .returning(Consent.id)
         )
-        consent = result.scalar_one_or_none()
         
-        if not consent:
+        if result.scalar_one_or_none() is None:
             return False
         
-        # Отозвать
-        consent.status = "Revoked"  # OpenBanking формат с заглавной буквы
-        consent.status_update_date_time = datetime.utcnow()
-        consent.revoked_at = datetime.utcnow()
-        
         await db.commit()
         return True
 
@@ -5,9 +5,9 @@ Iteration 3 + Межбанковские переводы (реализован
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from decimal import Decimal
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import Optional, Tuple
-import uuid
+from secrets import token_hex
 import httpx
 import logging
 
@@ -27,14 +27,20 @@ class PaymentService:
         to_account_number: str,
         amount: Decimal,
         description: str = "",
-        payment_consent_id: Optional[str] = None
+        payment_consent_id: Optional[str] = None,
+        now: Optional[datetime] = None
     ) -> Tuple[Payment, Optional[InterbankTransfer]]:
         """
         Инициация платежа
         
+        Args:
+            now: Время запроса (если уже получено вызывающим кодом)
+        
         Returns:
             (Payment, InterbankTransfer или None)
         """
+        now = now or datetime.now(timezone.utc).replace(tzinfo=None)
+        
         # Найти счет отправителя
         result = await db.execute(
             select(Account).where(Account.account_number == from_account_number)
@@ -48,7 +54,7 @@ class PaymentService:
             raise ValueError("Insufficient funds")
         
         # Создать payment
-        payment_id = f"pay-{uuid.uuid4().hex[:12]}"
+        payment_id = f"pay-{token_hex(6)}"
         
         payment = Payment(
             payment_id=payment_id,
@@ -58,7 +64,10 @@ class PaymentService:
             currency="RUB",
             destination_account=to_account_number,
             description=description,
-            status="AcceptedSettlementInProcess"
+            status="AcceptedSettlementInProcess",
+            # Обе даты из одного источника (время запроса), не из now() базы
+            creation_date_time=now,
+            status_update_date_time=now
         )
         
         # Списать со счета отправителя
@@ -79,7 +88,7 @@ class PaymentService:
             to_account.balance += amount
             payment.status = "AcceptedSettlementCompleted"
             payment.destination_bank = config.BANK_CODE
-            payment.status_update_date_time = datetime.utcnow()
+            payment.status_update_date_time = now
 
             # Создать транзакцию для отправителя (Debit - списание)
             transaction_debit = Transaction(
@@ -88,7 +97,7 @@ class PaymentService:
                 amount=amount,
                 balance_after=from_account.balance,
                 description=f"Перевод на счет {to_account_number}: {description}",
-                transaction_date=datetime.utcnow()
+                transaction_date=now
             )
             db.add(transaction_debit)
 
@@ -99,7 +108,7 @@ class PaymentService:
                 amount=amount,
                 balance_after=to_account.balance,
                 description=f"Перевод от счета {from_account_number}: {description}",
-                transaction_date=datetime.utcnow()
+                transaction_date=now
             )
             db.add(transaction_credit)
 
@@ -118,7 +127,7 @@ class PaymentService:
                 raise ValueError(f"Target account {to_account_number} not found in any bank")
             
             # Создать запись межбанкового перевода
-            transfer_id = f"transfer-{uuid.uuid4().hex[:12]}"
+            transfer_id = f"transfer-{token_hex(6)}"
             interbank_transfer = InterbankTransfer(
                 transfer_id=transfer_id,
                 payment_id=payment_id,
@@ -136,7 +145,7 @@ class PaymentService:
                 amount=amount,
                 balance_after=from_account.balance,
                 description=f"Межбанковский перевод в {target_bank} на счет {to_account_number}: {description}",
-                transaction_date=datetime.utcnow()
+                transaction_date=now
             )
             db.add(transaction_debit)
 
@@ -152,13 +161,15 @@ class PaymentService:
                     amount=amount,
                     description=description
                 )
+                # Одно время завершения перевода для всех записей ниже
+                completed_at = datetime.now(timezone.utc).replace(tzinfo=None)
 
                 if success:
                     # Перевод успешен
                     payment.status = "AcceptedSettlementCompleted"
                     payment.destination_bank = target_bank
                     interbank_transfer.status = "completed"
-                    interbank_transfer.completed_at = datetime.utcnow()
+                    interbank_transfer.completed_at = completed_at
 
                     # Обновить капитал банка-отправителя (-amount)
                     await PaymentService.update_bank_capital(
@@ -167,7 +178,7 @@ class PaymentService:
                         reason=f"Outgoing transfer to {target_bank}: {transfer_id}"
                     )
 
-                    logger.info(f"Interbank transfer {transfer_id} completed: {config.BANK_CODE} -> {target_bank}, {amount} RUB")
+                    logger.info("Interbank transfer %s completed: %s -> %s, %s RUB", transfer_id, config.BANK_CODE, target_bank, amount)
                 else:
                     # Перевод не удался - откат
                     payment.status = "Rejected"
@@ -183,15 +194,16 @@ class PaymentService:
                         amount=amount,
                         balance_after=from_account.balance,
                         description=f"Возврат неудачного перевода в {target_bank}",
-                        transaction_date=datetime.utcnow()
+                        transaction_date=completed_at
                     )
                     db.add(transaction_refund)
 
-                    logger.warning(f"Interbank transfer {transfer_id} failed, refunded to sender")
+                    logger.warning("Interbank transfer %s failed, refunded to sender", transfer_id)
 
             except Exception as e:
                 # Ошибка при вызове API - откат
-                logger.error(f"Interbank transfer {transfer_id} error: {str(e)}")
+                completed_at = datetime.now(timezone.utc).replace(tzinfo=None)
+                logger.error("Interbank transfer %s error: %s", transfer_id, e)
                 payment.status = "Rejected"
                 interbank_transfer.status = "failed"
 
@@ -205,26 +217,37 @@ class PaymentService:
                     amount=amount,
                     balance_after=from_account.balance,
                     description=f"Возврат из-за ошибки межбанковского перевода: {str(e)}",
-                    transaction_date=datetime.utcnow()
+                    transaction_date=completed_at
                 )
                 db.add(transaction_refund)
 
-            payment.status_update_date_time = datetime.utcnow()
+            payment.status_update_date_time = completed_at
 
         await db.commit()
-        await db.refresh(payment)
         
         return payment, interbank_transfer
     
     @staticmethod
     async def get_payment(
         db: AsyncSession,
-        payment_id: str
+        payment_id: str,
+        client_id: Optional[int] = None
     ) -> Optional[Payment]:
-        """Получить статус платежа"""
-        result = await db.execute(
-            select(Payment).where(Payment.payment_id == payment_id)
-        )
+        """
+        Получить статус платежа
+        
+        Args:
+            client_id: Если указан - платеж возвращается, только если счет
+                списания принадлежит этому клиенту (Client.id)
+        """
+        query = select(Payment).where(Payment.payment_id == payment_id)
+        
+        if client_id is not None:
+            query = query.join(Account, Account.id == Payment.account_id).where(
+                Account.client_id == client_id
+            )
+        
+        result = await db.execute(query)
         return result.scalar_one_or_none()
     
     @staticmethod
@@ -257,7 +280,6 @@ class PaymentService:
         
         # Обновить капитал
         capital_record.capital += amount_change
-        capital_record.updated_at = datetime.utcnow()
         
         await db.commit()
         
@@ -276,16 +298,18 @@ class PaymentService:
         """
         banks = ["vbank", "abank", "sbank"]
 
-        # Исключить свой банк из поиска
-        banks = [b for b in banks if b != config.BANK_CODE]
-
         # Проверяем каждый банк через локальные адреса (внутри Docker сети)
-        for bank_code in banks:
-            try:
-                # В Docker сети банки доступны по именам сервисов
-                bank_url = f"http://{bank_code}:8000"
+        # Один клиент на все проверки - пул соединений общий для всех банков
+        async with httpx.AsyncClient(timeout=5.0) as client:
+            for bank_code in banks:
+                # Исключить свой банк из поиска
+                if bank_code == config.BANK_CODE:
+                    continue
+
+                try:
+                    # В Docker сети банки доступны по именам сервисов
+                    bank_url = f"http://{bank_code}:8000"
 
-                async with httpx.AsyncClient(timeout=5.0) as client:
                     # Проверяем существование счета через GET /accounts (упрощенная проверка)
                     # В продакшене: специальный endpoint для проверки существования счета
                     response = await client.get(
@@ -294,12 +318,12 @@ class PaymentService:
                     )
 
                     if response.status_code == 200:
-                        logger.info(f"Account {account_number} found in {bank_code}")
+                        logger.info("Account %s found in %s", account_number, bank_code)
                         return bank_code
 
-            except Exception as e:
-                logger.debug(f"Failed to check account in {bank_code}: {str(e)}")
-                continue
+                except Exception as e:
+                    logger.debug("Failed to check account in %s: %s", bank_code, e)
+                    continue
 
         return None
 
@@ -344,13 +368,13 @@ class PaymentService:
 
                 if response.status_code == 201:
                     result = response.json()
-                    logger.info(f"Interbank transfer {transfer_id} sent successfully to {to_bank}: {result}")
+                    logger.info("Interbank transfer %s sent successfully to %s: %s", transfer_id, to_bank, result)
                     return True
                 else:
-                    logger.error(f"Interbank transfer {transfer_id} failed: {response.status_code} - {response.text}")
+                    logger.error("Interbank transfer %s failed: %s - %s", transfer_id, response.status_code, response.text)
                     return False
 
         except Exception as e:
-            logger.error(f"Failed to send interbank transfer {transfer_id}: {str(e)}")
+            logger.error("Failed to send interbank transfer %s: %s", transfer_id, e)
             return False
 
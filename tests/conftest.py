@@ -0,0 +1,90 @@
+"""
+Shared test setup: project root on sys.path and fakes for the DB session and Redis
+"""
+import os
+import sys
+
+import pytest
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeResult:
+    """Result of db.execute: a scalar, a list of entities or a list of rows"""
+
+    def __init__(self, value):
+        self.value = value
+
+    def scalar(self):
+        return self.value
+
+    def scalar_one_or_none(self):
+        return self.value
+
+    def scalars(self):
+        return iter(self.value)
+
+    def __iter__(self):
+        return iter(self.value)
+
+
+class FakeSession:
+    """AsyncSession stand-in: returns prepared results in order and records statements"""
+
+    def __init__(self, results):
+        self.results = list(results)
+        self.statements = []
+
+    async def execute(self, statement, *args, **kwargs):
+        self.statements.append(statement)
+        return FakeResult(self.results.pop(0))
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.pending = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def set(self, key, value, ex=None):
+        self.pending.append((key, value))
+
+    async def execute(self):
+        if self.redis.error is not None:
+            raise self.redis.error
+        self.redis.store.update(self.pending)
+        self.pending.clear()
+
+
+class FakeRedis:
+    """Redis stand-in: MGET and pipeline over a dict; error is raised by every call"""
+
+    def __init__(self, store=None, error=None):
+        self.store = dict(store or {})
+        self.error = error
+
+    async def mget(self, keys):
+        if self.error is not None:
+            raise self.error
+        return [self.store.get(key) for key in keys]
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+@pytest.fixture
+def fake_db():
+    """Session factory: fake_db(result1, result2, ...), one result per execute call"""
+    return lambda *results: FakeSession(results)
+
+
+@pytest.fixture
+def fake_redis():
+    """Redis factory: fake_redis(store={...}) or fake_redis(error=...)"""
+    return FakeRedis
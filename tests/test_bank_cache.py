@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Verify the Redis cache-aside lookup of banks by code
+"""
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from services.bank_service import bank_cache_key, get_banks_by_codes
+
+
+ABANK = {"id": 2, "code": "abank", "name": "Awesome Bank", "external": True, "api_url": "https://abank.example"}
+SBANK = {"id": 3, "code": "sbank", "name": "Smart Bank", "external": True, "api_url": "https://sbank.example"}
+
+
+def bank_rows(*banks):
+    """Rows as db.execute returns them for the bank lookup"""
+    return [SimpleNamespace(code=fields["code"], _mapping=fields) for fields in banks]
+
+
+@pytest.mark.asyncio
+async def test_cache_hit_skips_db(fake_db, fake_redis):
+    db = fake_db()
+    redis = fake_redis({bank_cache_key("abank"): json.dumps(ABANK)})
+
+    banks = await get_banks_by_codes(db, redis, ["abank"])
+
+    assert banks["abank"].id == ABANK["id"]
+    assert banks["abank"].external is True
+    assert db.statements == []
+
+
+@pytest.mark.asyncio
+async def test_cache_miss_loads_from_db_and_fills_cache(fake_db, fake_redis):
+    db = fake_db(bank_rows(SBANK))
+    redis = fake_redis({bank_cache_key("abank"): json.dumps(ABANK)})
+
+    banks = await get_banks_by_codes(db, redis, ["abank", "sbank", "abank"])
+
+    assert set(banks) == {"abank", "sbank"}
+    assert banks["sbank"].api_url == SBANK["api_url"]
+    assert len(db.statements) == 1
+    assert json.loads(redis.store[bank_cache_key("sbank")]) == SBANK
+
+
+@pytest.mark.asyncio
+async def test_unknown_code_is_not_cached(fake_db, fake_redis):
+    redis = fake_redis()
+
+    banks = await get_banks_by_codes(fake_db([]), redis, ["nobank"])
+
+    assert banks == {}
+    assert redis.store == {}
+
+
+@pytest.mark.asyncio
+async def test_redis_errors_fall_back_to_db(fake_db, fake_redis):
+    db = fake_db(bank_rows(ABANK))
+
+    banks = await get_banks_by_codes(db, fake_redis(error=ConnectionError("redis down")), ["abank"])
+
+    assert banks["abank"].id == ABANK["id"]
+    assert len(db.statements) == 1
+
+
+@pytest.mark.asyncio
+async def test_works_without_redis(fake_db):
+    banks = await get_banks_by_codes(fake_db(bank_rows(ABANK)), None, ["abank"])
+
+    assert banks["abank"].code == "abank"
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Verify that concurrent external account fetches for one client share a single call
+"""
+import asyncio
+
+import pytest
+
+from services import account_service
+from services.account_service import get_external_accounts_single_flight
+
+
+CLIENT = "demo-client-001"
+
+
+@pytest.fixture
+def fetch(monkeypatch):
+    """Replace get_external_accounts_for_client with a call that waits for release"""
+    state = {"calls": 0, "error": None, "result": [{"bank": "abank"}]}
+    started = asyncio.Event()
+    release = asyncio.Event()
+
+    async def fake_fetch(client_person_id, db, app_state_tokens):
+        state["calls"] += 1
+        started.set()
+        await release.wait()
+        if state["error"] is not None:
+            raise state["error"]
+        return state["result"]
+
+    monkeypatch.setattr(account_service, "get_external_accounts_for_client", fake_fetch)
+    account_service._inflight_external_accounts.clear()
+    state.update(started=started, release=release)
+    yield state
+    account_service._inflight_external_accounts.clear()
+
+
+async def start_leader_and_follower(fetch):
+    leader = asyncio.create_task(get_external_accounts_single_flight(CLIENT, None, {}))
+    await fetch["started"].wait()
+    follower = asyncio.create_task(get_external_accounts_single_flight(CLIENT, None, {}))
+    await asyncio.sleep(0)
+    return leader, follower
+
+
+@pytest.mark.asyncio
+async def test_follower_joins_leader_request(fetch):
+    leader, follower = await start_leader_and_follower(fetch)
+    fetch["release"].set()
+
+    assert await leader == fetch["result"]
+    assert await follower == fetch["result"]
+    assert fetch["calls"] == 1
+    assert CLIENT not in account_service._inflight_external_accounts
+
+
+@pytest.mark.asyncio
+async def test_follower_receives_leader_error(fetch):
+    fetch["error"] = RuntimeError("bank down")
+    leader, follower = await start_leader_and_follower(fetch)
+    fetch["release"].set()
+
+    with pytest.raises(RuntimeError):
+        await leader
+    with pytest.raises(RuntimeError):
+        await follower
+    assert fetch["calls"] == 1
+    assert CLIENT not in account_service._inflight_external_accounts
+
+
+@pytest.mark.asyncio
+async def test_cancelled_follower_leaves_leader_running(fetch):
+    leader, follower = await start_leader_and_follower(fetch)
+
+    follower.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await follower
+
+    fetch["release"].set()
+    assert await leader == fetch["result"]
+    assert fetch["calls"] == 1
+
+
+@pytest.mark.asyncio
+async def test_follower_refetches_when_leader_is_cancelled(fetch):
+    leader, follower = await start_leader_and_follower(fetch)
+
+    leader.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+
+    # The follower fetches on its own instead of failing with the leader's cancellation
+    fetch["release"].set()
+    assert await follower == fetch["result"]
+    assert fetch["calls"] == 2
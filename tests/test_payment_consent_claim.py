@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Verify how create_payment claims the payment consent on interbank requests
+"""
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from api import payments
+from api.payments import create_payment, PaymentRequest
+
+
+CLIENT = {"client_id": "team200-1", "cid": None, "type": "client"}
+CONSENT_ID = "pcon-test-001"
+REQUESTING_BANK = "team200"
+
+
+def payment_request():
+    return PaymentRequest.model_validate({
+        "data": {
+            "initiation": {
+                "instructedAmount": {"amount": "100.00", "currency": "RUB"},
+                "debtorAccount": {"identification": "40817810099910004312"},
+                "creditorAccount": {"identification": "40817810099910005423"}
+            }
+        }
+    })
+
+
+async def call_create_payment(db, consent_id=CONSENT_ID):
+    return await create_payment(
+        request=payment_request(),
+        x_fapi_interaction_id=None,
+        x_fapi_customer_ip_address=None,
+        x_payment_consent_id=consent_id,
+        x_requesting_bank=REQUESTING_BANK,
+        current_client=CLIENT,
+        db=db
+    )
+
+
+@pytest.fixture
+def initiated(monkeypatch):
+    """Replace PaymentService.initiate_payment and record its calls"""
+    calls = []
+
+    async def fake_initiate_payment(**kwargs):
+        calls.append(kwargs)
+        now = kwargs["now"]
+        payment = SimpleNamespace(
+            payment_id="pay-test-001",
+            status="completed",
+            creation_date_time=now,
+            status_update_date_time=now
+        )
+        return payment, None
+
+    monkeypatch.setattr(payments.PaymentService, "initiate_payment", staticmethod(fake_initiate_payment))
+    return calls
+
+
+@pytest.mark.asyncio
+async def test_missing_consent_header_is_rejected(initiated, fake_db):
+    db = fake_db()
+
+    with pytest.raises(HTTPException) as exc_info:
+        await call_create_payment(db, consent_id=None)
+
+    assert exc_info.value.status_code == 403
+    assert exc_info.value.detail["error"] == "PAYMENT_CONSENT_REQUIRED"
+    assert db.statements == []
+    assert initiated == []
+
+
+@pytest.mark.asyncio
+async def test_active_consent_is_claimed_once(initiated, fake_db):
+    db = fake_db(42)
+
+    response = await call_create_payment(db)
+
+    assert response.data.paymentId == "pay-test-001"
+    assert len(db.statements) == 1
+    assert initiated[0]["payment_consent_id"] == CONSENT_ID
+
+    # A single conditional UPDATE: active, not expired, granted to the requesting bank
+    claim = db.statements[0]
+    params = claim.compile().params
+    sql = str(claim)
+    assert sql.startswith("UPDATE payment_consents")
+    assert "RETURNING payment_consents.id" in sql
+    assert "payment_consents.expiration_date_time >" in sql
+    assert params["consent_id_1"] == CONSENT_ID
+    assert params["status_1"] == "active"
+    assert params["granted_to_1"] == REQUESTING_BANK
+    assert params["status"] == "used"
+
+
+@pytest.mark.asyncio
+async def test_unclaimable_consent_is_invalid(initiated, fake_db):
+    # A used, expired or unknown consent matches neither the claim UPDATE
+    # nor the other-bank lookup
+    db = fake_db(None, None)
+
+    with pytest.raises(HTTPException) as exc_info:
+        await call_create_payment(db)
+
+    assert exc_info.value.status_code == 403
+    assert exc_info.value.detail["error"] == "INVALID_CONSENT"
+    assert len(db.statements) == 2
+    assert initiated == []
+
+
+@pytest.mark.asyncio
+async def test_consent_granted_to_other_bank_is_mismatch(initiated, fake_db):
+    db = fake_db(None, 42)
+
+    with pytest.raises(HTTPException) as exc_info:
+        await call_create_payment(db)
+
+    assert exc_info.value.status_code == 403
+    assert exc_info.value.detail["error"] == "CONSENT_MISMATCH"
+    assert initiated == []
+
+    mismatch = db.statements[1]
+    params = mismatch.compile().params
+    assert "payment_consents.granted_to !=" in str(mismatch)
+    assert params["granted_to_1"] == REQUESTING_BANK